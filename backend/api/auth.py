@@ -8,18 +8,37 @@ from sqlalchemy import select
 import logging
 from datetime import timedelta
 
+from backend.core.admission import admission_control
 from backend.core.database import get_db
-from backend.core.security import get_password_hash, verify_password, create_access_token
+from backend.core.security import (
+    get_password_hash_async,
+    verify_password_async,
+    create_access_token,
+    HashQueueFull,
+)
 from backend.models.user import User
 from backend.schemas.user import UserCreate, UserResponse
 from backend.api.deps import get_current_user
+from backend.core.user_cache import CurrentUser
 from backend.core.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Вход и регистрация (pbkdf2) — общий лимит
+auth_admission = admission_control.limit("auth", settings.AUTH_CONCURRENCY, settings.AUTH_RATE, settings.AUTH_BURST)
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, try again later",
+        headers={"Retry-After": "1"},
+    )
+
+
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(auth_admission)])
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Регистрация нового пользователя"""
     try:
@@ -51,7 +70,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             )
         
         # Создание пользователя
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         db_user = User(
             email=user_data.email,
             username=user_data.username,
@@ -69,6 +88,8 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     
     except HTTPException:
         raise
+    except HashQueueFull:
+        raise _busy_exception()
     except Exception as e:
         logger.error(f"Registration error: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -77,7 +98,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
         )
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(auth_admission)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
@@ -90,16 +111,28 @@ async def login(
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+        except HashQueueFull:
+            raise _busy_exception()
+    
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Хеш с устаревшими параметрами прозрачно обновляется при входе
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "uid": user.id},
         expires_delta=access_token_expires
     )
     
@@ -112,7 +145,7 @@ async def login(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """Получить данные текущего пользователя"""
     return current_user
 
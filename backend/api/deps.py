@@ -6,19 +6,31 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from backend.core.database import get_db
+from backend.core.database import AsyncSessionLocal
 from backend.core.security import verify_token
+from backend.core.user_cache import user_cache, CurrentUser
 from backend.models.user import User
 from backend.core.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """Получить текущего пользователя из токена"""
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    """
+    Получить текущего пользователя из токена
+
+    Сессия БД открывается только при промахе кэша.
+    """
+    # Частый путь: токен уже проверен, ни JWT, ни БД не трогаем
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+    
+    async with AsyncSessionLocal() as db:
+        return await _load_current_user(db, token)
+
+
+async def _load_current_user(db: AsyncSession, token: str) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -33,18 +45,27 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
     
-    result = await db.execute(select(User).where(User.username == username))
-    user = result.scalar_one_or_none()
+    # Новые токены содержат id пользователя: поиск по первичному ключу
+    user_id = payload.get("uid")
+    if user_id is not None:
+        user = await db.get(User, user_id)
+        if user is not None and user.username != username:
+            user = None
+    else:
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalar_one_or_none()
     
-    if user is None:
+    if user is None or not user.is_active:
         raise credentials_exception
     
-    return user
+    current_user = CurrentUser.from_user(user)
+    user_cache.set(token, current_user, token_exp=payload.get("exp"))
+    return current_user
 
 
 async def get_current_dispatcher(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """Проверка роли диспетчера"""
     if not current_user.is_dispatcher:
         raise HTTPException(
@@ -52,4 +73,3 @@ async def get_current_dispatcher(
             detail="Only dispatchers can perform this action"
         )
     return current_user
-
@@ -1,19 +1,31 @@
 """
 Скрипт для заполнения тестовыми данными
 """
+import random
 from datetime import datetime, timedelta
+from typing import Dict
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.cities import get_or_create_city
+from backend.core.config import settings
 from backend.core.database import AsyncSessionLocal
+from backend.core.security import get_password_hash
 from backend.models.trip import Trip
+from backend.models.user import User
+
+# Города для синтетического расписания (нагрузочные тесты)
+SYNTHETIC_CITIES = [
+    "Москва", "Санкт-Петербург", "Казань", "Нижний Новгород", "Воронеж",
+    "Ярославль", "Тверь", "Рязань", "Тула", "Владимир", "Самара", "Саратов",
+    "Екатеринбург", "Челябинск", "Пермь", "Уфа", "Ростов-на-Дону", "Краснодар",
+]
 
 
 async def seed_trips():
     """Заполнение тестовыми рейсами"""
     async with AsyncSessionLocal() as session:
-        # Проверяем, есть ли уже рейсы
-        from sqlalchemy import select
-        result = await session.execute(select(Trip))
-        existing = result.scalars().all()
+        # Проверяем, есть ли уже рейсы (EXISTS, без чтения таблицы)
+        existing = await session.scalar(select(select(Trip.id).limit(1).exists()))
         if existing:
             print("Тестовые данные уже существуют")
             return
@@ -90,7 +102,76 @@ async def seed_trips():
         print(f"Создано {len(test_trips)} тестовых рейсов")
 
 
+async def seed_synthetic_trips(count: int, days: int = 30, capacity: int = 1000, rng_seed: int = 0) -> int:
+    """
+    Синтетическое расписание для нагрузочных тестов
+
+    `count` рейсов между SYNTHETIC_CITIES, равномерно на `days` дней начиная
+    с сегодняшнего. Вставка пачками по BULK_IMPORT_CHUNK_SIZE.
+    """
+    rng = random.Random(rng_seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    async with AsyncSessionLocal() as session:
+        city_ids: Dict[str, int] = {}
+        for name in SYNTHETIC_CITIES:
+            city_ids[name] = await get_or_create_city(session, name)
+        await session.commit()
+
+        values = []
+        for i in range(count):
+            origin, destination = rng.sample(SYNTHETIC_CITIES, 2)
+            departure = today + timedelta(days=i % max(days, 1), minutes=rng.randrange(0, 24 * 60, 5))
+            values.append({
+                "origin": origin,
+                "destination": destination,
+                "origin_city_id": city_ids[origin],
+                "destination_city_id": city_ids[destination],
+                "departure_time": departure,
+                "arrival_time": departure + timedelta(minutes=rng.randrange(60, 12 * 60, 15)),
+                "price": float(rng.randrange(500, 5000, 50)),
+                "capacity": capacity,
+                "seats_available": capacity,
+                "is_active": True,
+            })
+            if len(values) >= settings.BULK_IMPORT_CHUNK_SIZE:
+                await session.execute(insert(Trip), values)
+                await session.commit()
+                values = []
+        if values:
+            await session.execute(insert(Trip), values)
+            await session.commit()
+    return count
+
+
+async def seed_user(username: str, password: str, is_dispatcher: bool = False) -> None:
+    """Пользователь для нагрузочных тестов (если еще не создан)"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(User.id).where(User.username == username))
+        if result.scalar_one_or_none() is not None:
+            return
+        session.add(User(
+            email=f"{username}@example.com",
+            username=username,
+            full_name=username,
+            hashed_password=get_password_hash(password),
+            is_active=True,
+            is_dispatcher=is_dispatcher,
+        ))
+        await session.commit()
+
+
 if __name__ == "__main__":
+    import argparse
     import asyncio
-    asyncio.run(seed_trips())
+
+    parser = argparse.ArgumentParser(description="Заполнение тестовыми данными")
+    parser.add_argument("--trips", type=int, default=0, help="Число синтетических рейсов (0 — демо-набор)")
+    parser.add_argument("--days", type=int, default=30, help="На сколько дней распределить рейсы")
+    args = parser.parse_args()
+
+    if args.trips:
+        created = asyncio.run(seed_synthetic_trips(args.trips, args.days))
+        print(f"Создано {created} синтетических рейсов")
+    else:
+        asyncio.run(seed_trips())
 
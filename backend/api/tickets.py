@@ -1,29 +1,160 @@
 """
 API для покупки билетов
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, status
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, insert, Row
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 import logging
-import uuid
-from datetime import datetime
 
+from backend.core.admission import admission_control
+from backend.core.config import settings
 from backend.core.database import get_db
 from backend.models.ticket import Ticket
 from backend.models.trip import Trip
-from backend.schemas.ticket import TicketCreate, TicketResponse
-from backend.core.email import send_ticket_email
+from backend.schemas.ticket import TicketCreate, TicketResponse, TicketBatchCreate, TicketBatchResponse
+from backend.core.outbox import enqueue_email, outbox_worker
+from backend.core.events import event_hub
+from backend.core.idempotency import idempotency_store, request_fingerprint, IdempotencyTimeout, StoredResponse
+from backend.core.inventory import reserve_seats, allocated_seats
+from backend.core.ticket_numbers import ticket_numbers
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# (ключ с префиксом операции, хэш запроса) для сохранения ответа в транзакции покупки
+Idempotency = Optional[Tuple[str, str]]
 
-@router.post("/", response_model=TicketResponse, status_code=status.HTTP_201_CREATED)
+# Общий лимит одиночной и групповой покупки
+purchase_admission = admission_control.limit(
+    "purchase", settings.PURCHASE_CONCURRENCY, settings.PURCHASE_RATE, settings.PURCHASE_BURST,
+)
+
+
+def generate_ticket_number() -> str:
+    """Номер билета: уникален между процессами и возрастает во времени (см. ticket_numbers)"""
+    return ticket_numbers.next_number()
+
+
+def ticket_email_data(ticket_number: str, full_name: str, email: str, trip: Row, seat_number: int) -> Dict[str, Any]:
+    """Данные билета для письма"""
+    return {
+        "ticket_number": ticket_number,
+        "full_name": full_name,
+        "email": email,
+        "trip_origin": trip.origin,
+        "trip_destination": trip.destination,
+        "departure_time": trip.departure_time.strftime("%d.%m.%Y %H:%M"),
+        "arrival_time": trip.arrival_time.strftime("%d.%m.%Y %H:%M"),
+        "price": trip.price,
+        "seat_number": seat_number,
+    }
+
+
+def publish_seats(trip: Row, delta: int) -> None:
+    """Событие об изменении числа свободных мест для подписчиков /api/trips/events"""
+    event_hub.publish("seats", {"trip_id": trip.id, "seats_available": trip.seats_available, "delta": delta})
+
+
+async def _reservation_error(db: AsyncSession, trip_id: int) -> HTTPException:
+    """Причина неудачного списания мест: рейса нет или не хватает мест"""
+    exists = await db.execute(
+        select(Trip.id).where(Trip.id == trip_id, Trip.is_active == True)  # noqa: E712
+    )
+    if exists.scalar_one_or_none() is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Рейс не найден или неактивен"
+        )
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Нет свободных мест на рейс"
+    )
+
+
+def _integrity_conflict(e: IntegrityError) -> HTTPException:
+    """Нарушение ограничения БД при покупке (не повтор по Idempotency-Key)"""
+    logger.warning(f"Конфликт при сохранении покупки: {e.orig}")
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Покупка не выполнена из-за конфликта данных, повторите запрос"
+    )
+
+
+def _replay(stored: StoredResponse, fingerprint: str) -> Response:
+    """Повтор сохраненного ответа"""
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(
+            # Литерал: константа для 422 называется по-разному в разных версиях Starlette
+            status_code=422,
+            detail="Idempotency-Key уже использован для другого запроса"
+        )
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def _idempotent(
+    db: AsyncSession,
+    operation: str,
+    idempotency_key: Optional[str],
+    payload: BaseModel,
+    purchase: Callable[[Idempotency], Awaitable[Any]],
+):
+    """
+    Выполнить покупку с учетом заголовка Idempotency-Key
+
+    Без ключа покупка просто выполняется. С ключом повтор запроса возвращает
+    сохраненный ответ, не трогая рейс и очередь писем; параллельный запрос
+    с тем же ключом ждет завершения первого.
+    """
+    if not idempotency_key:
+        return await purchase(None)
+    key = f"{operation}:{idempotency_key}"
+    fingerprint = request_fingerprint(payload.model_dump_json().encode())
+    try:
+        async with idempotency_store.claim(key):
+            stored = await idempotency_store.get(db, key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            try:
+                return await purchase((key, fingerprint))
+            except IntegrityError as e:
+                # Тот же ключ успел закоммитить другой процесс
+                stored = await idempotency_store.get(db, key)
+                if stored is None:
+                    raise _integrity_conflict(e)
+                return _replay(stored, fingerprint)
+    except IdempotencyTimeout:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Запрос с этим Idempotency-Key еще выполняется",
+            headers={"Retry-After": "1"},
+        )
+
+
+@router.post("/", response_model=TicketResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(purchase_admission)])
 async def purchase_ticket(
     ticket_data: TicketCreate,
     db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
-    """Покупка билета на рейс"""
+    """Покупка билета на рейс (повтор с тем же Idempotency-Key вернет тот же билет)"""
+    return await _idempotent(
+        db, "ticket", idempotency_key, ticket_data,
+        lambda idempotency: _purchase_ticket(ticket_data, db, idempotency),
+    )
+
+
+async def _purchase_ticket(ticket_data: TicketCreate, db: AsyncSession, idempotency: Idempotency):
+    """Списание места, билет и письмо в одной транзакции"""
     try:
         # Проверка согласия на обработку данных
         if not ticket_data.consent_to_processing:
@@ -32,20 +163,14 @@ async def purchase_ticket(
                 detail="Необходимо согласие на обработку персональных данных"
             )
         
-        # Проверка существования рейса
-        result = await db.execute(
-            select(Trip).where(Trip.id == ticket_data.trip_id, Trip.is_active == True)  # noqa: E712
-        )
-        trip = result.scalar_one_or_none()
+        # Атомарное списание места: без чтения рейса перед записью
+        trip = await reserve_seats(db, ticket_data.trip_id)
         
         if not trip:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Рейс не найден или неактивен"
-            )
+            raise await _reservation_error(db, ticket_data.trip_id)
         
         # Генерация номера билета
-        ticket_number = f"BAL-{uuid.uuid4().hex[:8].upper()}-{datetime.now().strftime('%Y%m%d')}"
+        ticket_number = generate_ticket_number()
         
         # Создание билета
         db_ticket = Ticket(
@@ -53,38 +178,152 @@ async def purchase_ticket(
             full_name=ticket_data.full_name,
             email=ticket_data.email,
             price=trip.price,
+            seat_number=allocated_seats(trip)[0],
             ticket_number=ticket_number,
             is_paid=False,  # Пока муляж, потом через Элплат
         )
         
+        # Письмо с билетом ставится в очередь и отправляется фоновым воркером
+        email_data = ticket_email_data(
+            ticket_number, ticket_data.full_name, ticket_data.email, trip, db_ticket.seat_number
+        )
+        
+        # Место, билет и письмо фиксируются одной транзакцией
         db.add(db_ticket)
+        enqueue_email(db, "ticket", ticket_data.email, email_data)
+        if idempotency:
+            await db.flush()
+            await db.refresh(db_ticket)
+            idempotency_store.record(
+                db, *idempotency, status.HTTP_201_CREATED,
+                TicketResponse.model_validate(db_ticket).model_dump_json().encode(),
+            )
         await db.commit()
         await db.refresh(db_ticket)
-        
-        # Отправка email с билетом (муляж)
-        email_data = {
-            "ticket_number": ticket_number,
-            "full_name": ticket_data.full_name,
-            "email": ticket_data.email,
-            "trip_origin": trip.origin,
-            "trip_destination": trip.destination,
-            "departure_time": trip.departure_time.strftime("%d.%m.%Y %H:%M"),
-            "arrival_time": trip.arrival_time.strftime("%d.%m.%Y %H:%M"),
-            "price": trip.price,
-        }
-        
-        await send_ticket_email(ticket_data.email, email_data)
+        outbox_worker.notify()
+        publish_seats(trip, -1)
         
         logger.info(f"Билет создан: {ticket_number} для {ticket_data.full_name} ({ticket_data.email})")
         
         return db_ticket
     
     except HTTPException:
+        await db.rollback()
         raise
+    except IntegrityError as e:
+        await db.rollback()
+        if idempotency:
+            # Возможно, ответ с этим ключом уже сохранил другой процесс: проверит _idempotent
+            raise
+        raise _integrity_conflict(e)
     except Exception as e:
+        await db.rollback()
         logger.error(f"Ошибка покупки билета: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка сервера: {str(e)}"
         )
 
+
+@router.post("/batch", response_model=TicketBatchResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(purchase_admission)])
+async def purchase_tickets_batch(
+    batch: TicketBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    """
+    Групповая покупка билетов (один или несколько рейсов)
+
+    Места на всех рейсах списываются в одной транзакции: если на каком-либо
+    рейсе мест не хватает, заказ отменяется целиком. Все билеты вставляются
+    одним запросом, покупателю отправляется одно общее письмо.
+    """
+    return await _idempotent(
+        db, "ticket_batch", idempotency_key, batch,
+        lambda idempotency: _purchase_tickets_batch(batch, db, idempotency),
+    )
+
+
+async def _purchase_tickets_batch(batch: TicketBatchCreate, db: AsyncSession, idempotency: Idempotency):
+    """Списание мест на всех рейсах, билеты и общее письмо в одной транзакции"""
+    try:
+        if not batch.consent_to_processing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Необходимо согласие на обработку персональных данных"
+            )
+        
+        # Списание мест: по одному UPDATE на рейс, рейсы в порядке id,
+        # чтобы параллельные заказы блокировали строки в одном порядке
+        seats_needed = Counter(passenger.trip_id for passenger in batch.passengers)
+        trips: Dict[int, Row] = {}
+        seats: Dict[int, list] = {}
+        for trip_id in sorted(seats_needed):
+            trip = await reserve_seats(db, trip_id, seats_needed[trip_id])
+            if not trip:
+                raise await _reservation_error(db, trip_id)
+            trips[trip_id] = trip
+            seats[trip_id] = list(allocated_seats(trip, seats_needed[trip_id]))
+        
+        values = []
+        for passenger in batch.passengers:
+            trip = trips[passenger.trip_id]
+            values.append({
+                "trip_id": passenger.trip_id,
+                "full_name": passenger.full_name,
+                "email": passenger.email,
+                "price": trip.price,
+                "seat_number": seats[passenger.trip_id].pop(0),
+                "ticket_number": generate_ticket_number(),
+                "is_paid": False,  # Пока муляж, потом через Элплат
+            })
+        
+        result = await db.scalars(
+            insert(Ticket).returning(Ticket, sort_by_parameter_order=True),
+            values,
+        )
+        tickets = result.all()
+        total_price = sum(ticket.price for ticket in tickets)
+        
+        contact_email = batch.contact_email or batch.passengers[0].email
+        enqueue_email(db, "ticket_batch", contact_email, {
+            "tickets": [
+                ticket_email_data(
+                    ticket.ticket_number, ticket.full_name, ticket.email, trips[ticket.trip_id], ticket.seat_number
+                )
+                for ticket in tickets
+            ],
+            "total_price": total_price,
+        })
+        response = TicketBatchResponse(
+            tickets=[TicketResponse.model_validate(ticket) for ticket in tickets],
+            total_price=total_price,
+        )
+        if idempotency:
+            idempotency_store.record(db, *idempotency, status.HTTP_201_CREATED, response.model_dump_json().encode())
+        await db.commit()
+        outbox_worker.notify()
+        for trip_id, trip in trips.items():
+            publish_seats(trip, -seats_needed[trip_id])
+        
+        logger.info(f"Групповой заказ: {len(tickets)} билетов, письмо на {contact_email}")
+        
+        return response
+    
+    except HTTPException:
+        await db.rollback()
+        raise
+    except IntegrityError as e:
+        await db.rollback()
+        if idempotency:
+            # Возможно, ответ с этим ключом уже сохранил другой процесс: проверит _idempotent
+            raise
+        raise _integrity_conflict(e)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Ошибка групповой покупки билетов: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка сервера: {str(e)}"
+        )
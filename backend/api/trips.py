@@ -1,39 +1,366 @@
 """
 API для расписания рейсов
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from typing import List, Optional
-from datetime import date
+from sqlalchemy import select, or_, and_
+from typing import Iterable, List, Optional, Set, Tuple
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import base64
+import json
 
-from backend.core.database import get_db
+from backend.core.board import departure_board
+from backend.core.cache import schedule_cache, etag_matches, make_etag
+from backend.core.compression import CompressedCache, encoded_etag, negotiate_encoding
+from backend.core.cities import city_index, normalize_city, resolve_city_ids, assign_trip_cities
+from backend.core.config import settings
+from backend.core.database import get_db, get_read_db, read_router
+from backend.core.events import event_hub
+from backend.core.inventory import resize_capacity
+from backend.core.trip_import import (
+    import_trips,
+    parse_csv,
+    parse_ndjson,
+    expand_schedule,
+    schedule_size,
+    count_csv_rows,
+    count_ndjson_rows,
+)
 from backend.models.trip import Trip
-from backend.schemas.trip import TripCreate, TripUpdate, TripResponse
+from backend.schemas.trip import (
+    TripCreate,
+    TripUpdate,
+    TripResponse,
+    TripPage,
+    TripRow,
+    TripSchedule,
+    CitySuggestion,
+    BulkImportResult,
+)
 from backend.api.deps import get_current_dispatcher
 
 router = APIRouter()
 
+trip_list_adapter = TypeAdapter(List[TripResponse])
+# Быстрый путь (TRIPS_FAST_JSON): только нужные столбцы, сериализация без валидации
+trip_row_adapter = TypeAdapter(TripRow)
+trip_rows_adapter = TypeAdapter(List[TripRow])
+TRIP_ROW_COLUMNS = tuple(getattr(Trip, name) for name in TripRow.__annotations__)
+schedule_tz = ZoneInfo(settings.TIMEZONE)
 
-@router.get("/", response_model=List[TripResponse])
-async def list_trips(
+EXPORT_BATCH_SIZE = 500
+# Верхняя граница id в курсоре (BIGINT)
+MAX_TRIP_ID = 2 ** 63 - 1
+
+# Сжатые ответы со списками рейсов (TRIPS_COMPRESS_MIN_SIZE)
+compressed_trips = CompressedCache(settings.TRIPS_COMPRESS_CACHE_SIZE)
+
+
+def day_start(day: date) -> datetime:
+    """Начало суток в часовом поясе расписания"""
+    return datetime.combine(day, time.min, tzinfo=schedule_tz)
+
+
+def departure_between(query, date_from: Optional[date], date_to: Optional[date]):
+    """
+    Фильтр по дате отправления в виде полуинтервала [начало date_from, начало date_to + 1 день).
+
+    Сравнение голого столбца с границами позволяет использовать индекс по departure_time
+    (в отличие от func.date(departure_time) == ...).
+    """
+    if date_from:
+        query = query.where(Trip.departure_time >= day_start(date_from))
+    # У date.max нет следующего дня: такая верхняя граница ничего не отсекает
+    if date_to and date_to < date.max:
+        query = query.where(Trip.departure_time < day_start(date_to + timedelta(days=1)))
+    return query
+
+
+def _cached_response(
+    body: bytes, etag: str, if_none_match: Optional[str], accept_encoding: Optional[str] = None
+) -> Response:
+    """
+    Ответ со списком рейсов или 304, если у клиента актуальная версия.
+
+    Большие ответы сжимаются (если включено TRIPS_COMPRESS_MIN_SIZE): одно
+    и то же тело — один раз, сжатая версия берется из compressed_trips по ETag.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    encoding = None
+    if settings.TRIPS_COMPRESS_MIN_SIZE:
+        headers["Vary"] = "Accept-Encoding"
+        if len(body) >= settings.TRIPS_COMPRESS_MIN_SIZE:
+            encoding = negotiate_encoding(accept_encoding)
+            headers["ETag"] = encoded_etag(etag, encoding)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        body = compressed_trips.get(etag, body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def board_days(departures: Iterable[datetime]) -> Set[date]:
+    """Даты табло, на которые попадают рейсы с указанным временем отправления"""
+    days = set()
+    for departure in departures:
+        # Наивное время (SQLite) — как есть, с часовым поясом — в поясе расписания
+        days.add(departure.date())
+        if departure.tzinfo is not None:
+            days.add(departure.astimezone(schedule_tz).date())
+    return days
+
+
+def _schedule_changed(*departures: datetime) -> None:
+    """
+    Сброс кэша расписания после изменения рейса.
+
+    Табло отправлений сбрасывается только на даты переданных рейсов,
+    без них — целиком.
+    """
+    schedule_cache.bump()
+    if departures:
+        departure_board.invalidate(board_days(departures))
+    else:
+        departure_board.clear()
+
+
+def _publish_trip(action: str, trip: Trip) -> None:
+    """Событие об изменении рейса для подписчиков /events"""
+    if not trip.is_active:
+        event_hub.publish("trip", {"action": "deactivated", "id": trip.id})
+        return
+    event_hub.publish("trip", {
+        "action": action,
+        "trip": TripResponse.model_validate(trip).model_dump(mode="json"),
+    })
+
+
+@dataclass(frozen=True)
+class TripFilters:
+    """Фильтры публичного расписания"""
+    origin: Optional[str]
+    destination: Optional[str]
+    date_from: Optional[date]
+    date_to: Optional[date]
+
+    @property
+    def cache_key(self) -> tuple:
+        return (
+            normalize_city(self.origin) if self.origin else None,
+            normalize_city(self.destination) if self.destination else None,
+            self.date_from,
+            self.date_to,
+        )
+
+    @property
+    def board_day(self) -> Optional[date]:
+        """Дата, если запрос — все рейсы одного дня (его отдает табло отправлений)"""
+        if self.origin or self.destination or self.date_from != self.date_to:
+            return None
+        return self.date_from
+
+
+async def trip_filters(
     origin: Optional[str] = None,
     destination: Optional[str] = None,
     departure_date: Optional[date] = None,
-    _t: Optional[str] = None,  # Параметр для обхода кэша
-    db: AsyncSession = Depends(get_db),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> TripFilters:
+    """Разбор параметров фильтрации рейсов"""
+    if departure_date:
+        # Один день — частный случай диапазона
+        date_from = date_to = departure_date
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be later than date_to")
+    return TripFilters(origin, destination, date_from, date_to)
+
+
+async def build_trips_query(db: AsyncSession, filters: TripFilters):
+    """Запрос активных рейсов по фильтрам, упорядоченный по (departure_time, id)"""
+    query = select(Trip).where(Trip.is_active == True)  # noqa: E712
+    if filters.origin:
+        query = query.where(Trip.origin_city_id.in_(await resolve_city_ids(db, filters.origin)))
+    if filters.destination:
+        query = query.where(Trip.destination_city_id.in_(await resolve_city_ids(db, filters.destination)))
+    query = departure_between(query, filters.date_from, filters.date_to)
+    return query.order_by(Trip.departure_time, Trip.id)
+
+
+def encode_cursor(trip: Trip) -> str:
+    """Курсор на позицию после рейса (ключ сортировки departure_time, id)"""
+    raw = json.dumps([trip.departure_time.isoformat(), trip.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора, выданного encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        departure, trip_id = json.loads(raw)
+        trip_id = int(trip_id)
+        # 1e400 в JSON — бесконечность (OverflowError), id больше BIGINT не свяжется с запросом
+        if not 0 < trip_id <= MAX_TRIP_ID:
+            raise ValueError(trip_id)
+        return datetime.fromisoformat(departure), trip_id
+    except (ValueError, TypeError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _load_trips(db: AsyncSession, filters: TripFilters) -> Tuple[bytes, bool]:
+    """JSON со списком рейсов и признак того, что его можно кэшировать"""
+    query = await build_trips_query(db, filters)
+    if settings.TRIPS_FAST_JSON:
+        result = await db.execute(query.with_only_columns(*TRIP_ROW_COLUMNS))
+        body = trip_rows_adapter.dump_json([row._asdict() for row in result])
+    else:
+        result = await db.execute(query)
+        body = trip_list_adapter.dump_json(
+            trip_list_adapter.validate_python(result.scalars().all(), from_attributes=True)
+        )
+    # Реплика могла еще не получить последнее изменение: такой ответ не кэшируем
+    stale = db.info.get("replica") and read_router.lag_possible and schedule_cache.changed_within(read_router.max_lag)
+    return body, not stale
+
+
+@router.get("/", response_model=List[TripResponse])
+async def list_trips(
+    filters: TripFilters = Depends(trip_filters),
+    _t: Optional[str] = None,  # Устарело: игнорируется, кэш проверяется по ETag
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Публичный список рейсов"""
-    query = select(Trip).where(Trip.is_active == True)  # noqa: E712
-    if origin:
-        query = query.where(Trip.origin.ilike(f"%{origin}%"))
-    if destination:
-        query = query.where(Trip.destination.ilike(f"%{destination}%"))
-    if departure_date:
-        query = query.where(func.date(Trip.departure_time) == departure_date)
-    query = query.order_by(Trip.departure_time)
-    result = await db.execute(query)
-    return result.scalars().all()
+    board_day = filters.board_day
+    if board_day and departure_board.covers(board_day, datetime.now(schedule_tz).date()):
+        # Рейсы на один день (главная страница) — готовый ответ из табло отправлений;
+        # даты вне окна табло идут через общий кэш, чтобы не плодить записи по любой дате
+        entry = await departure_board.get(board_day, lambda day: _load_trips(db, filters))
+        return _cached_response(entry.body, entry.etag, if_none_match, accept_encoding)
+
+    key = filters.cache_key
+    entry = schedule_cache.get(key)
+    if entry is not None:
+        return _cached_response(entry.body, entry.etag, if_none_match, accept_encoding)
+
+    version = schedule_cache.version
+    body, cacheable = await _load_trips(db, filters)
+    if not cacheable:
+        return _cached_response(body, make_etag(body), if_none_match, accept_encoding)
+    entry = schedule_cache.set(key, body, version)
+    return _cached_response(entry.body, entry.etag, if_none_match, accept_encoding)
+
+
+@router.get("/page", response_model=TripPage)
+async def list_trips_page(
+    filters: TripFilters = Depends(trip_filters),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Постраничный список рейсов (keyset-пагинация по departure_time, id)"""
+    query = await build_trips_query(db, filters)
+    if cursor:
+        after_time, after_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Trip.departure_time > after_time,
+                and_(Trip.departure_time == after_time, Trip.id > after_id),
+            )
+        )
+    # Лишняя строка показывает, есть ли следующая страница
+    result = await db.execute(query.limit(limit + 1))
+    trips = result.scalars().all()
+    next_cursor = encode_cursor(trips[limit - 1]) if len(trips) > limit else None
+    return TripPage(
+        items=[TripResponse.model_validate(trip) for trip in trips[:limit]],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/export")
+async def export_trips(filters: TripFilters = Depends(trip_filters)):
+    """
+    Выгрузка рейсов в формате NDJSON (по строке JSON на рейс).
+
+    Строки читаются из БД порциями и отправляются по мере готовности,
+    поэтому объем памяти не зависит от размера выгрузки.
+    """
+    async def rows():
+        # Собственная сессия: зависимость закрывается до окончания стриминга
+        session_factory = await read_router.session_factory()
+        async with session_factory() as session:
+            query = await build_trips_query(session, filters)
+            if settings.TRIPS_FAST_JSON:
+                result = await session.stream(
+                    query.with_only_columns(*TRIP_ROW_COLUMNS).execution_options(yield_per=EXPORT_BATCH_SIZE)
+                )
+                async for row in result:
+                    yield trip_row_adapter.dump_json(row._asdict()) + b"\n"
+                return
+            result = await session.stream_scalars(
+                query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for trip in result:
+                yield TripResponse.model_validate(trip).model_dump_json().encode() + b"\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.get("/events")
+async def trip_events(last_event_id: Optional[str] = Header(None)):
+    """
+    Поток изменений расписания (Server-Sent Events)
+
+    События:
+    - trip — рейс создан или изменен (`{"action": "created"|"updated", "trip": {...}}`)
+      или снят с продажи (`{"action": "deactivated", "id": ...}`);
+    - seats — изменилось число свободных мест (`{"trip_id", "seats_available", "delta"}`);
+    - reset — изменений слишком много или историю не восстановить: перечитать расписание.
+
+    При переподключении браузер передает Last-Event-ID и получает пропущенные события.
+    """
+    if event_hub.full:
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "30"})
+    subscription = event_hub.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            # Интервал переподключения для EventSource
+            yield b"retry: 3000\n\n"
+            async for chunk in subscription.events(settings.EVENTS_HEARTBEAT):
+                yield chunk
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cities/suggest", response_model=List[CitySuggestion])
+async def suggest_cities(q: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50)):
+    """Автодополнение названия города"""
+    return [CitySuggestion(id=city_id, name=name) for city_id, name in city_index.suggest(q, limit)]
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Счетчики кэша расписания, табло отправлений, сжатых ответов и потока событий"""
+    return {
+        **schedule_cache.stats(),
+        "board": departure_board.stats(),
+        "compressed": compressed_trips.stats(),
+        "events": event_hub.stats(),
+    }
 
 
 @router.post("/", response_model=TripResponse)
@@ -43,13 +370,96 @@ async def create_trip(
     _: None = Depends(get_current_dispatcher),
 ):
     """Создать рейс (только диспетчер)"""
-    db_trip = Trip(**trip.dict())
+    db_trip = Trip(**trip.dict(), seats_available=trip.capacity)
+    await assign_trip_cities(db, db_trip)
     db.add(db_trip)
     await db.commit()
+    _schedule_changed(db_trip.departure_time)
     await db.refresh(db_trip)
+    _publish_trip("created", db_trip)
     return db_trip
 
 
+async def _read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Тело запроса не больше max_bytes, иначе 413.
+
+    Content-Length проверяется до чтения; без него (chunked) чтение
+    прерывается, как только тело превысит предел.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Request body too large (max {max_bytes} bytes)")
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            if int(content_length) > max_bytes:
+                raise too_large
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_trips(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(get_current_dispatcher),
+):
+    """
+    Массовое создание рейсов (только диспетчер)
+
+    Тело запроса по Content-Type:
+    - text/csv — строки с колонками origin, destination, departure_time, arrival_time, price[, capacity];
+    - application/x-ndjson — по JSON-объекту рейса на строку;
+    - application/json — правило повторения (TripSchedule): маршрут, время отправления,
+      дни недели и диапазон дат.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    raw = await _read_limited_body(request, settings.BULK_IMPORT_MAX_BYTES)
+
+    try:
+        if content_type == "application/json":
+            try:
+                schedule = TripSchedule.model_validate_json(raw)
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+            total = schedule_size(schedule)
+            rows = expand_schedule(schedule)
+        elif content_type in ("text/csv", "application/csv"):
+            total = count_csv_rows(raw)
+            rows = parse_csv(raw)
+        elif content_type in ("application/x-ndjson", "application/ndjson"):
+            total = count_ndjson_rows(raw)
+            rows = parse_ndjson(raw)
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail="Expected text/csv, application/x-ndjson or application/json",
+            )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 encoded")
+
+    if total > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many trips in one request (max {settings.BULK_IMPORT_MAX_ROWS})",
+        )
+
+    try:
+        result = await import_trips(db, rows)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 encoded")
+    finally:
+        # Часть пачек могла быть зафиксирована до ошибки
+        _schedule_changed()
+        event_hub.publish("reset", {})
+    return result
+
+
 @router.put("/{trip_id}", response_model=TripResponse)
 async def update_trip(
     trip_id: int,
@@ -62,10 +472,19 @@ async def update_trip(
     db_trip = result.scalar_one_or_none()
     if not db_trip:
         raise HTTPException(status_code=404, detail="Trip not found")
-    for key, value in trip_update.dict(exclude_unset=True).items():
+    changes = trip_update.dict(exclude_unset=True)
+    old_departure = db_trip.departure_time
+    capacity = changes.pop("capacity", None)
+    if capacity is not None and not await resize_capacity(db, trip_id, capacity):
+        raise HTTPException(status_code=400, detail="Capacity is less than the number of sold seats")
+    for key, value in changes.items():
         setattr(db_trip, key, value)
+    if "origin" in changes or "destination" in changes:
+        await assign_trip_cities(db, db_trip)
     await db.commit()
+    _schedule_changed(old_departure, db_trip.departure_time)
     await db.refresh(db_trip)
+    _publish_trip("updated", db_trip)
     return db_trip
 
 
@@ -82,5 +501,6 @@ async def delete_trip(
         raise HTTPException(status_code=404, detail="Trip not found")
     db_trip.is_active = False
     await db.commit()
+    _schedule_changed(db_trip.departure_time)
+    _publish_trip("deactivated", db_trip)
     return None
-
@@ -0,0 +1,186 @@
+"""
+Ограничение нагрузки на дорогие маршруты: одновременные запросы и частота с одного клиента
+"""
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from backend.core.config import settings
+from backend.core.metrics import metrics
+
+
+class RateLimitStore(ABC):
+    """
+    Хранилище корзин токенов.
+
+    По умолчанию — память процесса (MemoryRateLimitStore); для общего лимита
+    на все воркеры и серверы переопределите take поверх общего хранилища
+    и установите экземпляр в admission_control.store.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Взять токен: 0 — разрешено, иначе через сколько секунд появится токен"""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Корзины токенов в памяти процесса; самые давние клиенты вытесняются (LRU)"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # Ключ -> (токенов, время последнего обновления)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.evictions = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {"clients": len(self._buckets), "max_clients": self.max_keys, "evictions": self.evictions}
+
+
+class ConcurrencyLimiter:
+    """
+    Не больше `limit` одновременных запросов маршрута.
+
+    Остальные ждут слот в очереди до `queue_timeout` секунд; если очередь
+    уже заполнена (`max_queue`) или время вышло — 503 без ожидания дальше.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def _reject(self, reason: str) -> HTTPException:
+        self.rejected += 1
+        metrics.admission_rejected.inc(self.name, reason)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise self._reject("queue_full")
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout") from None
+        finally:
+            self.waiting -= 1
+            waited = time.perf_counter() - queued_at
+            self.wait_seconds += waited
+            metrics.admission_queue.observe(waited, self.name)
+        self.running += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds / self.admitted * 1000, 3) if self.admitted else 0.0,
+        }
+
+
+def client_key(request: Request) -> str:
+    """Адрес клиента (за прокси — из X-Forwarded-For, см. proxy_headers в run.py)"""
+    return request.client.host if request.client else "unknown"
+
+
+class AdmissionControl:
+    """Лимиты маршрутов: зависимость FastAPI на каждый ограничиваемый маршрут"""
+
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        self.rate_limited = 0
+
+    async def check_rate(self, name: str, request: Request, rate: float, burst: int) -> None:
+        """429 с Retry-After, если клиент исчерпал корзину токенов маршрута"""
+        wait = await self.store.take(f"{name}:{client_key(request)}", rate, burst)
+        if wait > 0:
+            self.rate_limited += 1
+            metrics.admission_rejected.inc(name, "rate_limit")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    def limit(self, name: str, concurrency: int, rate: float, burst: int):
+        """
+        Зависимость для маршрута `name`.
+
+        rate/burst — корзина токенов на клиента (rate=0 — без ограничения),
+        concurrency — одновременных запросов на процесс (0 — без ограничения).
+        """
+        limiter = None
+        if concurrency > 0:
+            limiter = self.limiters[name] = ConcurrencyLimiter(
+                name, concurrency, settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT,
+            )
+
+        async def dependency(request: Request) -> AsyncIterator[None]:
+            if settings.RATE_LIMIT_ENABLED and rate > 0:
+                await self.check_rate(name, request, rate, burst)
+            if limiter is None:
+                yield
+                return
+            async with limiter.slot():
+                yield
+
+        return dependency
+
+    def stats(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"rate_limited": self.rate_limited, **self.store.stats()}
+        for name, limiter in self.limiters.items():
+            for key, value in limiter.stats().items():
+                result[f"{name}_{key}"] = value
+        return result
+
+
+admission_control = AdmissionControl(MemoryRateLimitStore(settings.RATE_LIMIT_MAX_CLIENTS))
@@ -0,0 +1,136 @@
+"""
+Табло отправлений: готовый JSON со списком рейсов на каждую дату
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from backend.core.cache import CacheEntry, make_etag
+from backend.core.config import settings
+
+# Построение табло на дату: (тело ответа, можно ли его сохранить)
+BoardLoader = Callable[[date], Awaitable[Tuple[bytes, bool]]]
+
+
+class DepartureBoard:
+    """
+    Сериализованные списки рейсов по датам отправления.
+
+    Запись на дату хранится в памяти процесса и отдается без обращения
+    к БД, ORM и Pydantic. Изменение рейса сбрасывает только даты, которых
+    оно касается; табло на дату перестраивается при следующем чтении.
+    Одновременные промахи по одной дате ждут одного построения, а не
+    выполняют запрос каждый.
+    """
+
+    def __init__(self, maxdays: int, ttl: float):
+        self.maxdays = maxdays
+        self.ttl = ttl
+        self._data: "OrderedDict[date, CacheEntry]" = OrderedDict()
+        # Блокировки построения живут, пока дату строят или ждут: дат много, строятся единицы
+        self._locks: Dict[date, asyncio.Lock] = {}
+        self._lock_users: Dict[date, int] = {}
+        # Поколение даты растет при каждой инвалидации (и общее — при сбросе всего табло)
+        self._generations: Dict[date, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def _generation(self, day: date) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(day, 0)
+
+    def _fresh(self, day: date) -> Optional[CacheEntry]:
+        entry = self._data.get(day)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._data[day]
+            return None
+        self._data.move_to_end(day)
+        return entry
+
+    def covers(self, day: date, today: date) -> bool:
+        """Входит ли дата в окно табло: со вчерашнего дня на maxdays дней вперед"""
+        return -1 <= (day - today).days < self.maxdays
+
+    @asynccontextmanager
+    async def _building(self, day: date) -> AsyncIterator[None]:
+        """Блокировка построения даты; удаляется, когда ее больше никто не ждет"""
+        lock = self._locks.get(day)
+        if lock is None:
+            lock = self._locks[day] = asyncio.Lock()
+        self._lock_users[day] = self._lock_users.get(day, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[day] -= 1
+            if not self._lock_users[day]:
+                del self._lock_users[day]
+                del self._locks[day]
+
+    async def get(self, day: date, loader: BoardLoader) -> CacheEntry:
+        """Табло на дату; при отсутствии строится через `loader`"""
+        entry = self._fresh(day)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        async with self._building(day):
+            # Пока ждали блокировку, табло мог построить другой запрос
+            entry = self._fresh(day)
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+            generation = self._generation(day)
+            body, cacheable = await loader(day)
+            self.builds += 1
+            entry = CacheEntry(
+                body=body,
+                etag=make_etag(body),
+                version=generation[1],
+                expires_at=time.monotonic() + self.ttl,
+            )
+            # Рейс на эту дату изменился во время построения: не сохраняем
+            if cacheable and generation == self._generation(day) and self.maxdays > 0:
+                self._data[day] = entry
+                self._data.move_to_end(day)
+                while len(self._data) > self.maxdays:
+                    self._data.popitem(last=False)
+            return entry
+
+    def invalidate(self, days: Iterable[date]) -> None:
+        """Сбросить табло на указанные даты"""
+        for day in set(days):
+            self._generations[day] = self._generations.get(day, 0) + 1
+            self._data.pop(day, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Сбросить табло на все даты (например, после массового импорта)"""
+        self._epoch += 1
+        self._generations.clear()
+        self._data.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "days": len(self._data),
+            "building": len(self._locks),
+            "maxdays": self.maxdays,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+        }
+
+
+departure_board = DepartureBoard(
+    maxdays=settings.DEPARTURE_BOARD_DAYS,
+    ttl=settings.SCHEDULE_CACHE_TTL,
+)
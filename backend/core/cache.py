@@ -0,0 +1,127 @@
+"""
+Кэш расписания рейсов в памяти процесса
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+from backend.core.config import settings
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """Сериализованный ответ со списком рейсов"""
+    body: bytes
+    etag: str
+    version: int
+    expires_at: float
+
+
+def make_etag(body: bytes) -> str:
+    """ETag по содержимому ответа (одинаков во всех воркерах)"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Слабое сравнение: W/"x" совпадает с "x"
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ScheduleCache:
+    """
+    LRU-кэш с TTL для ответов GET /api/trips.
+
+    Каждая запись привязана к версии расписания: любое изменение рейса
+    увеличивает версию, и старые записи перестают выдаваться.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._version = 0
+        self._bumped_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """Получить запись, если она актуальна"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.version != self._version or entry.expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: Hashable, body: bytes, version: int) -> CacheEntry:
+        """
+        Сохранить ответ, полученный при версии `version`.
+
+        Если за время запроса к БД расписание изменилось, ответ не кэшируется.
+        """
+        entry = CacheEntry(
+            body=body,
+            etag=make_etag(body),
+            version=version,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        if version != self._version or self.maxsize <= 0:
+            return entry
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def bump(self) -> int:
+        """Инвалидация после изменения расписания"""
+        self._version += 1
+        self._bumped_at = time.monotonic()
+        self._data.clear()
+        self.invalidations += 1
+        return self._version
+
+    def changed_within(self, seconds: float) -> bool:
+        """Менялось ли расписание за последние `seconds` секунд"""
+        return time.monotonic() - self._bumped_at < seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики кэша"""
+        lookups = self.hits + self.misses
+        return {
+            "version": self._version,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+schedule_cache = ScheduleCache(
+    maxsize=settings.SCHEDULE_CACHE_SIZE,
+    ttl=settings.SCHEDULE_CACHE_TTL,
+)
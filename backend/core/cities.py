@@ -0,0 +1,228 @@
+"""
+Справочник городов: нормализация, префиксный и нечеткий поиск
+"""
+import bisect
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.models.city import City
+from backend.models.trip import Trip
+
+_SPACES = re.compile(r"\s+")
+_WORD_SPLIT = re.compile(r"[\s\-]+")
+
+
+def normalize_city(name: str) -> str:
+    """Нормализация названия: регистр (включая кириллицу), ё → е, пробелы"""
+    return _SPACES.sub(" ", name.strip()).casefold().replace("ё", "е")
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityIndex:
+    """
+    Индекс городов в памяти процесса.
+
+    Префиксный поиск идет по отсортированному списку начал слов (bisect),
+    нечеткий — по триграммам, если префикс ничего не нашел.
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.3):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._names: Dict[int, str] = {}
+        self._by_normalized: Dict[str, int] = {}
+        self._words: List[Tuple[str, int]] = []
+        self._trigrams: Dict[str, Set[int]] = defaultdict(set)
+        self._gram_counts: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, city_id: int, name: str) -> None:
+        """Добавить город в индекс"""
+        if city_id in self._names:
+            return
+        normalized = normalize_city(name)
+        self._names[city_id] = name
+        self._by_normalized[normalized] = city_id
+        words = {normalized, *(w for w in _WORD_SPLIT.split(normalized) if w)}
+        for word in words:
+            bisect.insort(self._words, (word, city_id))
+        grams = _trigrams(normalized)
+        for gram in grams:
+            self._trigrams[gram].add(city_id)
+        self._gram_counts[city_id] = len(grams)
+
+    def clear(self) -> None:
+        self._names.clear()
+        self._by_normalized.clear()
+        self._words.clear()
+        self._trigrams.clear()
+        self._gram_counts.clear()
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Точное совпадение по нормализованному имени"""
+        return self._by_normalized.get(normalize_city(name))
+
+    def name(self, city_id: int) -> Optional[str]:
+        return self._names.get(city_id)
+
+    def prefix(self, query: str) -> List[int]:
+        """Города, у которых имя или одно из слов начинается с query"""
+        normalized = normalize_city(query)
+        if not normalized:
+            return []
+        found: Dict[int, None] = {}
+        start = bisect.bisect_left(self._words, (normalized, -1))
+        for word, city_id in self._words[start:]:
+            if not word.startswith(normalized):
+                break
+            found.setdefault(city_id)
+        return list(found)
+
+    def fuzzy(self, query: str) -> List[int]:
+        """Города, похожие на query по триграммам (для опечаток)"""
+        query_grams = _trigrams(normalize_city(query))
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for city_id in self._trigrams.get(gram, ()):
+                counts[city_id] += 1
+        scored = []
+        for city_id, common in counts.items():
+            score = common / (len(query_grams) + self._gram_counts[city_id] - common)
+            if score >= self.fuzzy_threshold:
+                scored.append((-score, self._names[city_id], city_id))
+        scored.sort()
+        return [city_id for _, _, city_id in scored]
+
+    def resolve(self, query: str) -> List[int]:
+        """Идентификаторы городов для фильтра: сначала префикс, затем нечеткий поиск"""
+        return self.prefix(query) or self.fuzzy(query)
+
+    def suggest(self, query: str, limit: int = 10) -> List[Tuple[int, str]]:
+        """Подсказки для автодополнения"""
+        ids = self.resolve(query)
+        return [(city_id, self._names[city_id]) for city_id in ids[:limit]]
+
+
+city_index = CityIndex()
+
+
+async def _find_city(db: AsyncSession, normalized: str) -> Optional[City]:
+    result = await db.execute(select(City).where(City.name_normalized == normalized))
+    return result.scalar_one_or_none()
+
+
+async def get_or_create_city(db: AsyncSession, name: str) -> int:
+    """
+    Идентификатор города по названию (создает запись при необходимости).
+
+    В индекс процесса город попадает только после фиксации транзакции:
+    после отката в индексе не остается идентификатора, которого нет в БД.
+    """
+    city_id = city_index.lookup(name)
+    if city_id is not None:
+        return city_id
+    normalized = normalize_city(name)
+    city = await _find_city(db, normalized)
+    if city is None:
+        try:
+            async with db.begin_nested():
+                city = City(name=_SPACES.sub(" ", name.strip()), name_normalized=normalized)
+                db.add(city)
+        except IntegrityError:
+            # Тот же город одновременно создал другой запрос
+            city = await _find_city(db, normalized)
+            if city is None:
+                raise
+    db.info.setdefault("new_cities", []).append((city.id, city.name))
+    return city.id
+
+
+@event.listens_for(Session, "after_commit")
+def _index_committed_cities(session: Session) -> None:
+    for city_id, name in session.info.pop("new_cities", ()):
+        city_index.add(city_id, name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_cities(session: Session) -> None:
+    session.info.pop("new_cities", None)
+
+
+async def assign_trip_cities(db: AsyncSession, trip: Trip) -> None:
+    """Привязать рейс к городам справочника"""
+    trip.origin_city_id = await get_or_create_city(db, trip.origin)
+    trip.destination_city_id = await get_or_create_city(db, trip.destination)
+
+
+async def resolve_city_ids(db: AsyncSession, query: str) -> List[int]:
+    """
+    Идентификаторы городов для фильтра рейсов.
+
+    Если индекс этого процесса еще не знает город (его создал другой воркер),
+    выполняется префиксный запрос по индексу name_normalized.
+    """
+    ids = city_index.resolve(query)
+    if ids:
+        return ids
+    normalized = normalize_city(query)
+    if not normalized:
+        return []
+    result = await db.execute(
+        select(City).where(
+            City.name_normalized >= normalized,
+            City.name_normalized < normalized + "\uffff",
+        )
+    )
+    for city in result.scalars():
+        city_index.add(city.id, city.name)
+    return city_index.resolve(query)
+
+
+async def link_trip_cities(db: AsyncSession) -> int:
+    """
+    Привязать рейсы без city_id к справочнику (рейсы, созданные до его появления).
+
+    Города создаются по различным названиям, сами рейсы обновляются двумя
+    UPDATE ... WHERE *_city_id IS NULL без загрузки строк; updated_at
+    не меняется. Если непривязанных рейсов нет, выполняются только два
+    SELECT DISTINCT по индексу *_city_id.
+    """
+    updated = 0
+    for name_column, id_column in (
+        (Trip.origin, Trip.origin_city_id),
+        (Trip.destination, Trip.destination_city_id),
+    ):
+        names = (await db.scalars(select(name_column).where(id_column.is_(None)).distinct())).all()
+        if not names:
+            continue
+        city_ids = {name: await get_or_create_city(db, name) for name in names}
+        result = await db.execute(
+            update(Trip)
+            .where(id_column.is_(None))
+            .values({id_column: case(city_ids, value=name_column), Trip.updated_at: Trip.updated_at})
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    await db.commit()
+    return updated
+
+
+async def load_city_index(db: AsyncSession) -> None:
+    """Загрузка справочника при старте и привязка рейсов без city_id"""
+    await link_trip_cities(db)
+
+    city_index.clear()
+    result = await db.execute(select(City.id, City.name))
+    for city_id, name in result.all():
+        city_index.add(city_id, name)
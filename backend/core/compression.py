@@ -0,0 +1,97 @@
+"""
+Сжатие ответов: выбор кодировки по Accept-Encoding, gzip и brotli
+"""
+import gzip
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
+# Поддерживаемые кодировки в порядке предпочтения
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+# Уровни сжатия: максимальные — для страниц, сжимаемых один раз при запуске;
+# быстрые — для ответов, сжимаемых в цикле событий во время запроса
+MAX_LEVELS: Dict[str, int] = {"br": 11, "gzip": 9}
+FAST_LEVELS: Dict[str, int] = {"br": 5, "gzip": 6}
+
+
+def compress(body: bytes, encoding: str, levels: Dict[str, int] = MAX_LEVELS) -> bytes:
+    """Сжать тело ответа (mtime=0: одинаковый результат в каждом воркере)"""
+    if encoding == "br":
+        return brotli.compress(body, quality=levels["br"])
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=levels["gzip"], mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str] = ENCODINGS) -> Optional[str]:
+    """
+    Кодировка для ответа по заголовку Accept-Encoding.
+
+    Учитываются q-значения; при равных — порядок `available`.
+    None — отдавать без сжатия.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Строгий ETag для сжатого представления: у разных байтов — разные ETag"""
+    if encoding is None:
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+class CompressedCache:
+    """
+    LRU сжатых тел ответов по ETag: одно и то же тело сжимается один раз.
+
+    Сжатие идет в цикле событий при промахе, поэтому по умолчанию с быстрыми уровнями.
+    """
+
+    def __init__(self, maxsize: int, levels: Dict[str, int] = FAST_LEVELS):
+        self.maxsize = maxsize
+        self.levels = levels
+        self._data: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str, body: bytes, encoding: str) -> bytes:
+        key = (etag, encoding)
+        compressed = self._data.get(key)
+        if compressed is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return compressed
+        self.misses += 1
+        compressed = compress(body, encoding, self.levels)
+        if self.maxsize > 0:
+            self._data[key] = compressed
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return compressed
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
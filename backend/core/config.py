@@ -10,14 +10,43 @@ class Settings(BaseSettings):
     # Основные настройки
     PROJECT_NAME: str = "BAL_BUS"
     DEBUG: bool = True
+    TIMEZONE: str = "Europe/Moscow"  # Часовой пояс расписания (границы суток)
     
     # База данных (по умолчанию SQLite для простоты)
     DATABASE_URL: str = "sqlite+aiosqlite:///./balbus.db"
+    # Реплика для публичного чтения расписания. Пусто: для файла SQLite
+    # открывается отдельное соединение только для чтения (mode=ro), иначе
+    # чтение идет через основную БД
+    DATABASE_READ_URL: str = ""
+    READ_REPLICA_MAX_LAG: float = 5.0  # Допустимое отставание реплики, секунды
+    READ_REPLICA_CHECK_INTERVAL: float = 10.0  # Период проверки реплики, секунды
+    DB_ECHO: bool = False  # Логировать каждый SQL-запрос (только для отладки)
+    DB_PREPARED: bool = False  # Таблицы и тестовые данные уже подготовлены (задает run.py --prod)
+    SEED_DEMO_DATA: bool = True  # Заполнять пустую БД демонстрационными рейсами при запуске
+    DB_POOL_SIZE: int = 5  # Постоянных соединений в пуле
+    DB_MAX_OVERFLOW: int = 10  # Дополнительных соединений сверх пула при пиках
+    DB_POOL_TIMEOUT: float = 30.0  # Ожидание свободного соединения, секунды
+    DB_POOL_RECYCLE: int = 1800  # Пересоздавать соединения старше, секунды (-1 — никогда)
+    DB_POOL_PRE_PING: bool = True  # Проверять соединение перед выдачей из пула
+    # SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL: чтение не блокируется записью
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # В режиме WAL безопасно и быстрее FULL
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Ожидание блокировки вместо ошибки "database is locked"
+    SQLITE_MMAP_SIZE: int = 268435456  # Отображение файла БД в память, байты
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production-min-32-chars"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Хеширование паролей (pbkdf2_sha256)
+    PASSWORD_HASH_ROUNDS: int = 29000  # При изменении хеши обновляются при входе
+    PASSWORD_HASH_WORKERS: int = 2  # Потоков для хеширования
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Максимум операций в работе и в очереди
+
+    # Кэш проверенных токенов (get_current_user)
+    USER_CACHE_SIZE: int = 1024  # Максимум токенов в кэше (LRU)
+    USER_CACHE_TTL: float = 60.0  # Время жизни записи, секунды; при нескольких воркерах — задержка применения смены роли в остальных
     
     # Email настройки (для отправки билетов)
     SMTP_ENABLED: bool = False  # Включить реальную отправку email
@@ -27,7 +56,73 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""  # Пароль или токен приложения
     SMTP_FROM_NAME: str = "BAL_BUS"  # Имя отправителя
     SMTP_USE_TLS: bool = True  # Использовать TLS (для порта 587)
-    
+    SMTP_TIMEOUT: float = 30.0  # Таймаут операций SMTP, секунды
+    SMTP_POOL_SIZE: int = 2  # Максимум одновременных SMTP-соединений
+    SMTP_IDLE_TIMEOUT: float = 60.0  # Закрывать соединения, простаивающие дольше, секунды
+    SMTP_KEEPALIVE_INTERVAL: float = 15.0  # Проверять NOOP соединения, простаивающие дольше, секунды
+
+    # Фоновая отправка писем (outbox)
+    EMAIL_OUTBOX_WORKERS: int = 2  # Число параллельных отправителей
+    EMAIL_OUTBOX_POLL_INTERVAL: float = 5.0  # Период опроса очереди, секунды
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50  # Писем за один опрос
+    EMAIL_MAX_ATTEMPTS: int = 5  # После стольких неудач письмо помечается failed
+    EMAIL_RETRY_BASE_DELAY: float = 10.0  # Задержка перед первым повтором, секунды
+    EMAIL_RETRY_MAX_DELAY: float = 3600.0  # Верхняя граница экспоненциальной задержки
+    EMAIL_SEND_LEASE: float = 120.0  # На столько письмо резервируется за воркером
+
+    # Кэш расписания (GET /api/trips)
+    SCHEDULE_CACHE_SIZE: int = 256  # Максимум записей (LRU)
+    SCHEDULE_CACHE_TTL: float = 30.0  # Время жизни записи, секунды
+    DEPARTURE_BOARD_DAYS: int = 31  # Табло отправлений: сколько дат держать в памяти
+    TRIPS_FAST_JSON: bool = False  # Списки рейсов: кортежи столбцов без валидации TripResponse
+    TRIPS_COMPRESS_MIN_SIZE: int = 0  # Сжимать списки рейсов от этого размера, байт (0 — выключено)
+    TRIPS_COMPRESS_CACHE_SIZE: int = 256  # Сколько сжатых ответов держать в памяти (LRU)
+
+    # Поток событий расписания (GET /api/trips/events)
+    EVENTS_QUEUE_SIZE: int = 256  # Очередь клиента; при переполнении клиент отключается
+    EVENTS_HISTORY: int = 1000  # Столько последних событий доступно для Last-Event-ID
+    EVENTS_MAX_CLIENTS: int = 10000  # Максимум одновременных подписчиков на процесс
+    EVENTS_HEARTBEAT: float = 15.0  # Пинг при простое, секунды
+
+    # Ключи идемпотентности покупки билетов (заголовок Idempotency-Key)
+    IDEMPOTENCY_TTL: float = 86400.0  # Сколько хранится ответ, секунды
+    IDEMPOTENCY_CACHE_SIZE: int = 10000  # Ответов в памяти процесса (LRU)
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 30.0  # Ожидание параллельного запроса с тем же ключом
+
+    # Ограничение нагрузки на покупку билетов и вход (ответы 429/503 с Retry-After)
+    RATE_LIMIT_ENABLED: bool = True  # Лимит частоты запросов с одного адреса
+    RATE_LIMIT_MAX_CLIENTS: int = 100000  # Адресов в памяти процесса (LRU)
+    PURCHASE_RATE: float = 1.0  # Покупок в секунду с одного адреса (в среднем)
+    PURCHASE_BURST: int = 10  # Покупок подряд с одного адреса
+    PURCHASE_CONCURRENCY: int = 32  # Одновременных покупок на процесс; 0 — без ограничения
+    AUTH_RATE: float = 0.5  # Входов и регистраций в секунду с одного адреса
+    AUTH_BURST: int = 10
+    AUTH_CONCURRENCY: int = 8  # Одновременных входов и регистраций на процесс; 0 — без ограничения
+    ADMISSION_QUEUE_SIZE: int = 128  # Запросов в ожидании слота; сверх этого — сразу 503
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0  # Ожидание слота, секунды
+
+    # Номера билетов (backend/core/ticket_numbers.py)
+    TICKET_NODE_ID: int = 0  # Номер сервера, 0–15: у каждого сервера с общей БД — свой
+    TICKET_LOCK_DIR: str = ""  # Каталог файлов-блокировок слотов процессов; пусто — временный каталог ОС
+
+    # Продакшен-сервер (python run.py --prod)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8006
+    SERVER_WORKERS: int = 0  # Число воркеров; 0 — по числу CPU
+    SERVER_LIMIT_MAX_REQUESTS: int = 0  # Перезапуск воркера после стольких запросов; 0 — не перезапускать
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0  # Ожидание завершения запросов при SIGTERM, секунды
+    SERVER_KEEPALIVE: int = 5  # Keep-alive соединений, секунды
+
+    # Метрики (GET /metrics)
+    METRICS_ENABLED: bool = True  # Замер запросов к API и к БД
+    METRICS_SLOW_QUERY: float = 0.1  # Запрос к БД медленнее этого считается медленным, секунды
+
+    # Массовый импорт рейсов
+    BULK_IMPORT_MAX_ROWS: int = 200000  # Максимум строк в одном запросе
+    BULK_IMPORT_MAX_BYTES: int = 64 * 1024 * 1024  # Максимальный размер тела запроса, байт
+    BULK_IMPORT_CHUNK_SIZE: int = 2000  # Строк в одной транзакции
+    BULK_IMPORT_MAX_ERRORS: int = 1000  # Сколько ошибок возвращать в ответе
+
     class Config:
         env_file = ".env"
         case_sensitive = True
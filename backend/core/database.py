@@ -1,16 +1,79 @@
 """
 Настройка базы данных
 """
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from backend.core.config import settings
+from backend.core.metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Параметры engine (пул соединений) для заданного URL"""
+    parsed = make_url(url)
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO, "future": True}
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # БД в памяти существует только в рамках одного соединения
+        options["poolclass"] = StaticPool
+        return options
+    options.update(
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def configure_sqlite(async_engine, read_only: bool = False) -> None:
+    """PRAGMA для каждого нового соединения SQLite"""
+    if async_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # Режим журнала хранится в файле БД, его задает пишущее соединение
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.close()
+
+
+def read_database_url() -> Optional[str]:
+    """URL для чтения: DATABASE_READ_URL или файл SQLite в режиме только для чтения"""
+    if settings.DATABASE_READ_URL:
+        return settings.DATABASE_READ_URL
+    parsed = make_url(settings.DATABASE_URL)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    if parsed.database.startswith("file:"):
+        return None  # URI уже задан явно
+    read_url = parsed.set(
+        database=f"file:{parsed.database}",
+        query={**parsed.query, "mode": "ro", "uri": "true"},
+    )
+    return read_url.render_as_string(hide_password=False)
+
 
 # Создание async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True,
-)
+engine = create_async_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+configure_sqlite(engine)
+instrument_engine(engine, "primary")
 
 # Создание session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -35,3 +98,116 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
+
+class ReadRouter:
+    """
+    Выбор БД для публичного чтения: реплика или основная.
+
+    Реплика периодически проверяется (не чаще READ_REPLICA_CHECK_INTERVAL):
+    если она недоступна или отстает больше READ_REPLICA_MAX_LAG, чтение
+    идет в основную БД до следующей успешной проверки.
+    """
+
+    def __init__(self, read_engine, max_lag: float, check_interval: float):
+        self.read_engine = read_engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.healthy = read_engine is not None
+        self.lag = 0.0
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._session_factory = (
+            async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+            if read_engine is not None
+            else None
+        )
+        self.replica_sessions = 0
+        self.primary_sessions = 0
+
+    @property
+    def lag_possible(self) -> bool:
+        """Может ли реплика отставать (у SQLite в режиме ro данные общие с основной БД)"""
+        return self.read_engine is not None and self.read_engine.dialect.name != "sqlite"
+
+    async def _measure_lag(self) -> float:
+        async with self.read_engine.connect() as conn:
+            if self.read_engine.dialect.name == "postgresql":
+                # Время последней воспроизведенной транзакции растет и при простое основной БД:
+                # если все полученное WAL уже воспроизведено, реплика не отстает
+                result = await conn.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                ))
+                return float(result.scalar() or 0.0)
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+    async def check(self) -> bool:
+        """Проверка реплики (результат кэшируется на check_interval)"""
+        if self.read_engine is None:
+            return False
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self.healthy
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self.healthy
+            try:
+                self.lag = await asyncio.wait_for(self._measure_lag(), timeout=2.0)
+                healthy = self.lag <= self.max_lag
+                if not healthy:
+                    logger.warning(f"Реплика отстает на {self.lag:.1f} с, чтение переключено на основную БД")
+            except Exception as e:
+                healthy = False
+                logger.warning(f"Реплика недоступна, чтение переключено на основную БД: {e}")
+            self.healthy = healthy
+            self._checked_at = time.monotonic()
+            return healthy
+
+    async def session_factory(self) -> async_sessionmaker:
+        """Фабрика сессий для чтения с учетом состояния реплики"""
+        if await self.check():
+            self.replica_sessions += 1
+            return self._session_factory
+        self.primary_sessions += 1
+        return AsyncSessionLocal
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "configured": self.read_engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": round(self.lag, 3),
+            "replica_sessions": self.replica_sessions,
+            "primary_sessions": self.primary_sessions,
+        }
+
+
+_read_url = read_database_url()
+read_engine = create_async_engine(_read_url, **engine_options(_read_url)) if _read_url else None
+if read_engine is not None:
+    configure_sqlite(read_engine, read_only=True)
+    instrument_engine(read_engine, "replica")
+
+read_router = ReadRouter(
+    read_engine,
+    max_lag=settings.READ_REPLICA_MAX_LAG,
+    check_interval=settings.READ_REPLICA_CHECK_INTERVAL,
+)
+
+
+async def get_read_db(request: Request) -> AsyncIterator[AsyncSession]:
+    """
+    Dependency для публичного чтения: сессия реплики, если она доступна.
+
+    Запросы с токеном (диспетчер после правки расписания) читают из основной
+    БД, чтобы видеть собственные изменения.
+    """
+    if "authorization" in request.headers:
+        factory = AsyncSessionLocal
+    else:
+        factory = await read_router.session_factory()
+    async with factory() as session:
+        session.info["replica"] = factory is not AsyncSessionLocal
+        try:
+            yield session
+        finally:
+            await session.close()
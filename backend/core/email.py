@@ -1,158 +1,349 @@
 """
 Функции для отправки email
 """
+import asyncio
+import base64
 import logging
-from typing import Dict, Any
-from email.mime.text import MIMEText
+import ssl
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, List, Optional, Sequence, Tuple
 from email.mime.multipart import MIMEMultipart
-import aiosmtplib
+from email.mime.nonmultipart import MIMENonMultipart
+
+from jinja2 import Template
 
 from backend.core.config import settings
+from backend.core.templates import template_env
+
+if TYPE_CHECKING:
+    # aiosmtplib загружается при первой отправке, а не при запуске приложения
+    import aiosmtplib
 
 logger = logging.getLogger(__name__)
 
+EMAIL_TEMPLATES = ("email/ticket.txt", "email/ticket.html", "email/tickets.txt", "email/tickets.html")
 
-async def send_ticket_email(email: str, ticket_data: Dict[str, Any]) -> bool:
+# base64 кодирует строки по 57 байт (76 символов): заранее закодированную
+# часть можно дописывать к остальному, только если ее длина кратна 57
+_B64_LINE_BYTES = 57
+_CONTENT_MARKER = "\x00"
+
+
+@lru_cache(maxsize=None)
+def _template(name: str) -> Template:
+    """Шаблон письма компилируется один раз (при запуске приложения, см. load_email_templates)"""
+    return template_env.get_template(name)
+
+
+def _b64(content: str) -> str:
+    return base64.encodebytes(content.encode("utf-8")).decode("ascii")
+
+
+class _HTMLLayout:
     """
-    Отправка email с билетом
+    HTML-письмо: неизменная обертка шаблона и блок content.
+
+    Шапка со стилями и подвал рендерятся один раз; шапка дополняется
+    пробелами до длины, кратной 57 байтам, и кодируется в base64 заранее.
+    На каждое письмо рендерится и кодируется только блок content с подвалом.
     """
-    try:
-        # Если SMTP не включен, используем муляж
-        if not settings.SMTP_ENABLED or not settings.SMTP_USER or not settings.SMTP_PASSWORD:
-            logger.info(f"📧 [МУЛЯЖ] Отправка билета на email: {email}")
-            logger.info(f"📧 [МУЛЯЖ] Данные билета:")
-            logger.info(f"   - Номер билета: {ticket_data.get('ticket_number')}")
-            logger.info(f"   - ФИО: {ticket_data.get('full_name')}")
-            logger.info(f"   - Рейс: {ticket_data.get('trip_origin')} → {ticket_data.get('trip_destination')}")
-            logger.info(f"   - Отправление: {ticket_data.get('departure_time')}")
-            logger.info(f"   - Прибытие: {ticket_data.get('arrival_time')}")
-            logger.info(f"   - Цена: {ticket_data.get('price')} ₽")
-            return True
-        
-        # Реальная отправка через SMTP
-        message = MIMEMultipart("alternative")
-        message["Subject"] = f"Билет на рейс {ticket_data.get('trip_origin')} → {ticket_data.get('trip_destination')}"
-        message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_USER}>"
-        message["To"] = email
-        
-        # HTML версия письма
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center; border-radius: 10px 10px 0 0; }}
-                .content {{ background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; }}
-                .ticket-info {{ background: white; padding: 20px; margin: 20px 0; border-radius: 8px; border-left: 4px solid #667eea; }}
-                .ticket-number {{ font-size: 24px; font-weight: bold; color: #667eea; text-align: center; margin: 20px 0; }}
-                .info-row {{ margin: 10px 0; padding: 10px; background: #f8f9fa; border-radius: 5px; }}
-                .info-label {{ font-weight: bold; color: #666; }}
-                .price {{ font-size: 20px; color: #198754; font-weight: bold; text-align: center; margin: 20px 0; }}
-                .footer {{ text-align: center; margin-top: 30px; color: #666; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🎫 {settings.SMTP_FROM_NAME}</h1>
-                    <p>Ваш билет на автобусный рейс</p>
-                </div>
-                <div class="content">
-                    <div class="ticket-number">
-                        Номер билета: {ticket_data.get('ticket_number')}
-                    </div>
-                    
-                    <div class="ticket-info">
-                        <div class="info-row">
-                            <span class="info-label">Пассажир:</span> {ticket_data.get('full_name')}
-                        </div>
-                        <div class="info-row">
-                            <span class="info-label">Маршрут:</span> {ticket_data.get('trip_origin')} → {ticket_data.get('trip_destination')}
-                        </div>
-                        <div class="info-row">
-                            <span class="info-label">Отправление:</span> {ticket_data.get('departure_time')}
-                        </div>
-                        <div class="info-row">
-                            <span class="info-label">Прибытие:</span> {ticket_data.get('arrival_time')}
-                        </div>
-                    </div>
-                    
-                    <div class="price">
-                        Цена: {ticket_data.get('price')} ₽
-                    </div>
-                    
-                    <div class="footer">
-                        <p>Спасибо за использование BAL_BUS!</p>
-                        <p>Приятной поездки! 🚌</p>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Текстовая версия письма (для клиентов без поддержки HTML)
-        text_content = f"""
-Билет на автобусный рейс
 
-Номер билета: {ticket_data.get('ticket_number')}
+    def __init__(self, name: str):
+        self.template = _template(name)
+        wrapper = template_env.from_string(
+            f'{{% extends "{name}" %}}{{% block content %}}{_CONTENT_MARKER}{{% endblock %}}'
+        ).render(from_name=settings.SMTP_FROM_NAME)
+        prefix, self.suffix = wrapper.split(_CONTENT_MARKER)
+        prefix += " " * (-len(prefix.encode("utf-8")) % _B64_LINE_BYTES)
+        self.prefix = prefix
+        self.prefix_b64 = _b64(prefix)
 
-Пассажир: {ticket_data.get('full_name')}
-Маршрут: {ticket_data.get('trip_origin')} → {ticket_data.get('trip_destination')}
-Отправление: {ticket_data.get('departure_time')}
-Прибытие: {ticket_data.get('arrival_time')}
-Цена: {ticket_data.get('price')} ₽
+    def content(self, context: Dict[str, Any]) -> str:
+        return "".join(self.template.blocks["content"](self.template.new_context(context)))
+
+    def render(self, context: Dict[str, Any]) -> str:
+        return self.prefix + self.content(context) + self.suffix
+
+    def render_b64(self, context: Dict[str, Any]) -> str:
+        return self.prefix_b64 + _b64(self.content(context) + self.suffix)
+
+
+@lru_cache(maxsize=None)
+def _ticket_layout() -> _HTMLLayout:
+    return _HTMLLayout("email/ticket.html")
+
+
+def load_email_templates() -> None:
+    """Компиляция шаблонов писем и кодирование обертки письма с билетом (при запуске)"""
+    for name in EMAIL_TEMPLATES:
+        _template(name)
+    _ticket_layout()
+
+
+_from_header = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_USER}>"
+
+
+def _ticket_context(ticket_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {**ticket_data, "from_name": settings.SMTP_FROM_NAME}
+
+
+def _ticket_subject(ticket_data: Dict[str, Any]) -> str:
+    return f"Билет на рейс {ticket_data.get('trip_origin')} → {ticket_data.get('trip_destination')}"
+
+
+def render_ticket_email(ticket_data: Dict[str, Any]) -> Tuple[str, str, str]:
+    """
+    Рендеринг письма с билетом: (тема, текст, HTML)
+
+    Чистая функция без ввода-вывода, ее можно вызывать из пула потоков.
+    """
+    context = _ticket_context(ticket_data)
+    return (
+        _ticket_subject(ticket_data),
+        _template("email/ticket.txt").render(context),
+        _ticket_layout().render(context),
+    )
+
+
+def render_tickets_email(booking_data: Dict[str, Any]) -> Tuple[str, str, str]:
+    """
+    Рендеринг общего письма с несколькими билетами: (тема, текст, HTML)
+
+    booking_data: {"tickets": [данные билета, ...], "total_price": сумма}
+    """
+    context = {**booking_data, "from_name": settings.SMTP_FROM_NAME}
+    subject = f"Ваши билеты ({len(booking_data.get('tickets', []))}) — {settings.SMTP_FROM_NAME}"
+    return subject, _template("email/tickets.txt").render(context), _template("email/tickets.html").render(context)
+
+
+def _text_part(subtype: str, encoded: str) -> MIMENonMultipart:
+    """
+    Часть письма из готового base64 (UTF-8).
+
+    Заголовки те же, что у MIMEText(..., "utf-8"), но без разбора
+    параметров и повторного кодирования тела в set_charset.
+    """
+    part = MIMENonMultipart("text", subtype, charset="utf-8")
+    part["Content-Transfer-Encoding"] = "base64"
+    part.set_payload(encoded)
+    return part
+
+
+def _assemble(email: str, subject: str, text_b64: str, html_b64: str) -> MIMEMultipart:
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = _from_header
+    message["To"] = email
+    
+    # Текстовая версия (для клиентов без поддержки HTML) идет первой
+    message.attach(_text_part("plain", text_b64))
+    message.attach(_text_part("html", html_b64))
+    
+    return message
+
+
+def _build_message(email: str, subject: str, text_content: str, html_content: str) -> MIMEMultipart:
+    return _assemble(email, subject, _b64(text_content), _b64(html_content))
+
+
+def build_ticket_message(email: str, ticket_data: Dict[str, Any]) -> MIMEMultipart:
+    """
+    Сборка письма с билетом (HTML и текстовая версии)
+
+    Шапка HTML со стилями берется уже закодированной (см. _HTMLLayout).
+    """
+    context = _ticket_context(ticket_data)
+    return _assemble(
+        email,
+        _ticket_subject(ticket_data),
+        _b64(_template("email/ticket.txt").render(context)),
+        _ticket_layout().render_b64(context),
+    )
+
+
+def build_ticket_messages(items: Sequence[Tuple[str, Dict[str, Any]]]) -> List[MIMEMultipart]:
+    """Сборка нескольких писем (для запуска в пуле потоков)"""
+    return [build_ticket_message(email, ticket_data) for email, ticket_data in items]
+
+
+class SMTPPool:
+    """
+    Пул постоянных SMTP-соединений.
+
+    Соединение устанавливается (TLS + логин) один раз и переиспользуется:
+    перед выдачей простаивавшее дольше SMTP_KEEPALIVE_INTERVAL соединение
+    проверяется командой NOOP, а простаивавшее дольше SMTP_IDLE_TIMEOUT
+    закрывается. Разорванное соединение заменяется новым.
+    """
+
+    def __init__(self, size: int, idle_timeout: float, keepalive_interval: float):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._idle: List[Tuple["aiosmtplib.SMTP", float]] = []
+        self._slots = asyncio.Semaphore(size)
+        self.connects = 0
+        self.reuses = 0
+
+    def _client(self) -> "aiosmtplib.SMTP":
+        import aiosmtplib
 
-Спасибо за использование {settings.SMTP_FROM_NAME}!
-Приятной поездки!
-        """
-        
-        # Добавляем обе версии в письмо
-        text_part = MIMEText(text_content, "plain", "utf-8")
-        html_part = MIMEText(html_content, "html", "utf-8")
-        
-        message.attach(text_part)
-        message.attach(html_part)
-        
-        # Отправка через SMTP
-        # Используем более надежный подход с явным созданием клиента
         if settings.SMTP_PORT == 587 or (settings.SMTP_USE_TLS and settings.SMTP_PORT != 465):
             # Порт 587 использует STARTTLS (TLS)
-            async with aiosmtplib.SMTP(
+            return aiosmtplib.SMTP(
                 hostname=settings.SMTP_HOST,
                 port=settings.SMTP_PORT,
                 use_tls=False,
                 start_tls=True,
-                timeout=30
-            ) as smtp:
-                await smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                await smtp.send_message(message)
-        elif settings.SMTP_PORT == 465:
+                timeout=settings.SMTP_TIMEOUT,
+            )
+        if settings.SMTP_PORT == 465:
             # Порт 465 использует SSL
-            import ssl
-            ssl_context = ssl.create_default_context()
-            async with aiosmtplib.SMTP(
+            return aiosmtplib.SMTP(
                 hostname=settings.SMTP_HOST,
                 port=settings.SMTP_PORT,
                 use_tls=True,
-                tls_context=ssl_context,
-                timeout=30
-            ) as smtp:
-                await smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+                tls_context=ssl.create_default_context(),
+                timeout=settings.SMTP_TIMEOUT,
+            )
+        # Без шифрования (не рекомендуется)
+        return aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            use_tls=False,
+            timeout=settings.SMTP_TIMEOUT,
+        )
+
+    async def _connect(self) -> "aiosmtplib.SMTP":
+        smtp = self._client()
+        await smtp.connect()
+        await smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    async def _discard(smtp: "aiosmtplib.SMTP") -> None:
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _checkout(self) -> "aiosmtplib.SMTP":
+        while self._idle:
+            smtp, released_at = self._idle.pop()
+            idle = time.monotonic() - released_at
+            if idle > self.idle_timeout or not smtp.is_connected:
+                await self._discard(smtp)
+                continue
+            if idle > self.keepalive_interval:
+                try:
+                    await smtp.noop()
+                except Exception:
+                    await self._discard(smtp)
+                    continue
+            self.reuses += 1
+            return smtp
+        return await self._connect()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator["aiosmtplib.SMTP"]:
+        """Взять соединение из пула (не больше SMTP_POOL_SIZE одновременно)"""
+        async with self._slots:
+            smtp = await self._checkout()
+            try:
+                yield smtp
+            except BaseException:
+                await self._discard(smtp)
+                raise
+            else:
+                self._idle.append((smtp, time.monotonic()))
+
+    async def send(self, message: MIMEMultipart) -> None:
+        """Отправить письмо; при разрыве соединения — одна повторная попытка на новом"""
+        import aiosmtplib
+
+        try:
+            async with self.connection() as smtp:
                 await smtp.send_message(message)
-        else:
-            # Без шифрования (не рекомендуется)
-            async with aiosmtplib.SMTP(
-                hostname=settings.SMTP_HOST,
-                port=settings.SMTP_PORT,
-                use_tls=False,
-                timeout=30
-            ) as smtp:
-                await smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+            async with self.connection() as smtp:
                 await smtp.send_message(message)
+
+    async def send_many(self, messages: Sequence[MIMEMultipart]) -> List[Optional[Exception]]:
+        """
+        Отправить несколько писем подряд в одной авторизованной сессии.
+
+        Возвращает ошибку для каждого письма (None — отправлено). При разрыве
+        соединения оставшиеся письма отправляются через новое соединение.
+        """
+        import aiosmtplib
+
+        errors: List[Optional[Exception]] = []
+        pending = list(messages)
+        reconnected = False
+        while pending:
+            try:
+                async with self.connection() as smtp:
+                    while pending:
+                        try:
+                            await smtp.send_message(pending[0])
+                            errors.append(None)
+                        except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPDataError,
+                                aiosmtplib.SMTPSenderRefused) as e:
+                            # Ошибка конкретного письма, сессия остается рабочей
+                            errors.append(e)
+                        pending.pop(0)
+            except (aiosmtplib.SMTPException, ConnectionError) as e:
+                if reconnected or not pending:
+                    errors.extend(e for _ in pending)
+                    break
+                reconnected = True
+        return errors
+
+    async def close(self) -> None:
+        """Закрыть простаивающие соединения"""
+        idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            await self._discard(smtp)
+
+
+smtp_pool = SMTPPool(
+    size=settings.SMTP_POOL_SIZE,
+    idle_timeout=settings.SMTP_IDLE_TIMEOUT,
+    keepalive_interval=settings.SMTP_KEEPALIVE_INTERVAL,
+)
+
+
+def smtp_configured() -> bool:
+    """Включена ли реальная отправка (иначе используется муляж)"""
+    return bool(settings.SMTP_ENABLED and settings.SMTP_USER and settings.SMTP_PASSWORD)
+
+
+def _log_mock(email: str, ticket_data: Dict[str, Any]) -> None:
+    logger.info(f"📧 [МУЛЯЖ] Отправка билета на email: {email}")
+    logger.info(f"📧 [МУЛЯЖ] Данные билета:")
+    logger.info(f"   - Номер билета: {ticket_data.get('ticket_number')}")
+    logger.info(f"   - ФИО: {ticket_data.get('full_name')}")
+    logger.info(f"   - Рейс: {ticket_data.get('trip_origin')} → {ticket_data.get('trip_destination')}")
+    logger.info(f"   - Отправление: {ticket_data.get('departure_time')}")
+    logger.info(f"   - Прибытие: {ticket_data.get('arrival_time')}")
+    logger.info(f"   - Цена: {ticket_data.get('price')} ₽")
+
+
+async def send_ticket_email(email: str, ticket_data: Dict[str, Any]) -> bool:
+    """
+    Отправка email с билетом
+    """
+    try:
+        # Если SMTP не включен, используем муляж
+        if not smtp_configured():
+            _log_mock(email, ticket_data)
+            return True
+        
+        await smtp_pool.send(build_ticket_message(email, ticket_data))
         
         logger.info(f"✅ Email успешно отправлен на {email} (билет: {ticket_data.get('ticket_number')})")
         return True
@@ -160,3 +351,51 @@ async def send_ticket_email(email: str, ticket_data: Dict[str, Any]) -> bool:
     except Exception as e:
         logger.error(f"❌ Ошибка отправки email на {email}: {str(e)}", exc_info=True)
         return False
+
+
+async def send_tickets_email(email: str, booking_data: Dict[str, Any]) -> bool:
+    """
+    Отправка одного письма со всеми билетами группового заказа
+    """
+    try:
+        if not smtp_configured():
+            for ticket_data in booking_data.get("tickets", []):
+                _log_mock(email, ticket_data)
+            return True
+        
+        message = _build_message(email, *render_tickets_email(booking_data))
+        await smtp_pool.send(message)
+        
+        logger.info(f"✅ Email успешно отправлен на {email} (билетов: {len(booking_data.get('tickets', []))})")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Ошибка отправки email на {email}: {str(e)}", exc_info=True)
+        return False
+
+
+async def send_many(items: Sequence[Tuple[str, Dict[str, Any]]]) -> List[bool]:
+    """
+    Отправка нескольких билетов через одно SMTP-соединение
+
+    items — пары (email, данные билета); возвращает признак успеха для каждой.
+    """
+    if not smtp_configured():
+        for email, ticket_data in items:
+            _log_mock(email, ticket_data)
+        return [True] * len(items)
+    
+    try:
+        # Рендеринг пачки писем не блокирует цикл событий
+        messages = await asyncio.to_thread(build_ticket_messages, items)
+        errors = await smtp_pool.send_many(messages)
+    except Exception as e:
+        logger.error(f"❌ Ошибка пакетной отправки email: {str(e)}", exc_info=True)
+        return [False] * len(items)
+    
+    for (email, ticket_data), error in zip(items, errors):
+        if error is None:
+            logger.info(f"✅ Email успешно отправлен на {email} (билет: {ticket_data.get('ticket_number')})")
+        else:
+            logger.error(f"❌ Ошибка отправки email на {email}: {error}")
+    return [error is None for error in errors]
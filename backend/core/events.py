@@ -0,0 +1,163 @@
+"""
+Рассылка изменений расписания и свободных мест подписчикам (Server-Sent Events)
+"""
+import asyncio
+import json
+import logging
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Event:
+    """Событие, уже закодированное в формат text/event-stream"""
+    seq: int
+    payload: bytes
+
+
+class Subscription:
+    """Очередь событий одного клиента"""
+
+    _CLOSED = None
+
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def push(self, event: Event) -> bool:
+        """Положить событие; False — очередь переполнена"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self) -> None:
+        """Завершить поток: освобождаем место под маркер конца, если нужно"""
+        while True:
+            try:
+                self.queue.put_nowait(self._CLOSED)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+    async def events(self, heartbeat: float) -> AsyncIterator[bytes]:
+        """События клиента; при простое — комментарий-пинг, чтобы прокси не закрыли соединение"""
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if event is self._CLOSED:
+                return
+            yield event.payload
+
+
+class EventHub:
+    """
+    Pub/sub внутри процесса для GET /api/trips/events.
+
+    У каждого клиента своя ограниченная очередь. Если клиент не успевает
+    читать и очередь переполняется, он отключается — браузер переподключится
+    с заголовком Last-Event-ID и получит пропущенное из истории.
+
+    Идентификатор события — "<эпоха процесса>-<номер>": после перезапуска
+    или при переподключении к другому воркеру номер не из этой истории,
+    и клиент получает событие reset (перечитать расписание целиком).
+    """
+
+    def __init__(self, queue_size: int, history: int, max_clients: int):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.epoch = secrets.token_hex(4)
+        self._seq = 0
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def _encode(self, seq: int, kind: str, data: Any) -> bytes:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+        return f"id: {self.epoch}-{seq}\nevent: {kind}\ndata: {body}\n\n".encode()
+
+    def publish(self, kind: str, data: Any) -> None:
+        """Разослать событие всем подписчикам"""
+        self._seq += 1
+        event = Event(seq=self._seq, payload=self._encode(self._seq, kind, data))
+        self._history.append(event)
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if not subscription.push(event):
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        subscription.dropped = True
+        self._subscribers.discard(subscription)
+        subscription.close()
+        self.dropped += 1
+        logger.info("SSE: медленный клиент отключен")
+
+    def _missed(self, last_event_id: Optional[str]) -> Optional[list]:
+        """События после last_event_id или None, если продолжить нельзя"""
+        try:
+            epoch, seq = last_event_id.rsplit("-", 1)
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch or seq > self._seq:
+            return None
+        if seq < self._seq and (not self._history or self._history[0].seq > seq + 1):
+            return None  # Часть событий уже вытеснена из истории
+        return [event for event in self._history if event.seq > seq]
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_clients
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """Новый подписчик; при Last-Event-ID — с пропущенными событиями"""
+        subscription = Subscription(self.queue_size)
+        if last_event_id:
+            missed = self._missed(last_event_id)
+            if missed is None:
+                subscription.push(Event(self._seq, self._encode(self._seq, "reset", {})))
+            else:
+                for event in missed:
+                    if not subscription.push(event):
+                        # Пропущено больше, чем помещается в очередь: пусть перечитает всё
+                        subscription = Subscription(self.queue_size)
+                        subscription.push(Event(self._seq, self._encode(self._seq, "reset", {})))
+                        break
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def close(self) -> None:
+        """Завершить все потоки (остановка сервера)"""
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "history": len(self._history),
+        }
+
+
+event_hub = EventHub(
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+    history=settings.EVENTS_HISTORY,
+    max_clients=settings.EVENTS_MAX_CLIENTS,
+)
@@ -0,0 +1,153 @@
+"""
+Идемпотентность покупки билетов: повтор запроса с тем же Idempotency-Key
+возвращает первый ответ без повторного списания мест и отправки письма
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.config import settings
+from backend.models.idempotency_key import IdempotencyKey
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """Сохраненный ответ на запрос с ключом идемпотентности"""
+    fingerprint: str
+    status_code: int
+    body: bytes
+    expires_at: float
+
+
+class IdempotencyTimeout(Exception):
+    """Параллельный запрос с тем же ключом не завершился вовремя"""
+
+
+def request_fingerprint(body: bytes) -> str:
+    """Хэш тела запроса: один ключ нельзя использовать для разных покупок"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Ответы по ключам идемпотентности: LRU-кэш в памяти поверх таблицы idempotency_keys.
+
+    Запись в таблицу добавляется в транзакцию покупки (record), поэтому ответ
+    сохраняется тогда и только тогда, когда закоммичен билет. Параллельные
+    запросы с одним ключом в процессе выполняются по очереди (claim): второй
+    дожидается первого и получает его ответ. Между процессами дубликат
+    отсекает уникальный индекс по ключу.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        # Ключ -> (блокировка, число запросов, ожидающих или держащих ее)
+        self._inflight: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        self.replays = 0
+        self.waits = 0
+
+    @asynccontextmanager
+    async def claim(self, key: str, timeout: float = settings.IDEMPOTENCY_WAIT_TIMEOUT) -> AsyncIterator[None]:
+        """Выполнить блок, пока другие запросы с этим ключом ждут"""
+        lock, count = self._inflight.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        elif lock.locked():
+            self.waits += 1
+        self._inflight[key] = (lock, count + 1)
+        try:
+            try:
+                await asyncio.wait_for(lock.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise IdempotencyTimeout(key)
+            try:
+                yield
+            finally:
+                lock.release()
+        finally:
+            lock, count = self._inflight[key]
+            if count <= 1:
+                del self._inflight[key]
+            else:
+                self._inflight[key] = (lock, count - 1)
+
+    def _remember(self, key: str, stored: StoredResponse) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = stored
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get(self, db: AsyncSession, key: str) -> Optional[StoredResponse]:
+        """Сохраненный ответ по ключу (из памяти или из БД)"""
+        stored = self._data.get(key)
+        if stored is not None:
+            if stored.expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.replays += 1
+                return stored
+            del self._data[key]
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        row = (await db.execute(select(IdempotencyKey).where(IdempotencyKey.key == key))).scalar_one_or_none()
+        if row is None:
+            return None
+        created_at = row.created_at
+        if created_at is not None and created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)  # SQLite хранит время без пояса
+        if created_at is not None and created_at < cutoff:
+            # Ключ устарел: освобождаем его для новой покупки в этой же транзакции
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == row.id))
+            return None
+        age = (datetime.now(timezone.utc) - created_at).total_seconds() if created_at else 0.0
+        stored = StoredResponse(
+            fingerprint=row.fingerprint,
+            status_code=row.status_code,
+            body=row.response.encode(),
+            expires_at=time.monotonic() + max(self.ttl - age, 0.0),
+        )
+        self._remember(key, stored)
+        self.replays += 1
+        return stored
+
+    def record(self, db: AsyncSession, key: str, fingerprint: str, status_code: int, body: bytes) -> None:
+        """Добавить ответ в текущую транзакцию (фиксируется вместе с покупкой)"""
+        db.add(IdempotencyKey(
+            key=key,
+            fingerprint=fingerprint,
+            status_code=status_code,
+            response=body.decode(),
+        ))
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """Удалить устаревшие ключи"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+        await db.commit()
+        return result.rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "replays": self.replays,
+            "waits": self.waits,
+        }
+
+
+idempotency_store = IdempotencyStore(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+    ttl=settings.IDEMPOTENCY_TTL,
+)
@@ -0,0 +1,65 @@
+"""
+Учет свободных мест на рейсах
+"""
+from typing import Optional
+
+from sqlalchemy import update, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models.trip import Trip
+
+
+async def reserve_seats(db: AsyncSession, trip_id: int, count: int = 1) -> Optional[Row]:
+    """
+    Атомарно списать `count` мест с активного рейса.
+
+    Один условный UPDATE ... WHERE seats_available >= count RETURNING без
+    предварительного чтения: параллельные покупки не могут продать больше мест,
+    чем есть. Возвращает строку рейса после списания или None, если рейс
+    не найден, неактивен или мест не хватает. Списание фиксируется вместе
+    с транзакцией сессии.
+    """
+    result = await db.execute(
+        update(Trip)
+        .where(
+            Trip.id == trip_id,
+            Trip.is_active == True,  # noqa: E712
+            Trip.seats_available >= count,
+        )
+        .values(seats_available=Trip.seats_available - count)
+        .returning(
+            Trip.id,
+            Trip.origin,
+            Trip.destination,
+            Trip.departure_time,
+            Trip.arrival_time,
+            Trip.price,
+            Trip.capacity,
+            Trip.seats_available,
+        )
+    )
+    return result.one_or_none()
+
+
+def allocated_seats(trip: Row, count: int = 1) -> range:
+    """Номера мест, выданных последним списанием (места нумеруются по порядку продажи)"""
+    sold = trip.capacity - trip.seats_available
+    return range(sold - count + 1, sold + 1)
+
+
+async def resize_capacity(db: AsyncSession, trip_id: int, capacity: int) -> bool:
+    """
+    Изменить вместимость рейса, сохранив число проданных мест.
+
+    Возвращает False, если новая вместимость меньше уже проданного.
+    """
+    result = await db.execute(
+        update(Trip)
+        .where(Trip.id == trip_id, Trip.capacity - Trip.seats_available <= capacity)
+        .values(
+            seats_available=Trip.seats_available + capacity - Trip.capacity,
+            capacity=capacity,
+        )
+        .returning(Trip.id)
+    )
+    return result.one_or_none() is not None
@@ -0,0 +1,258 @@
+"""
+Метрики приложения в текстовом формате Prometheus (GET /metrics)
+"""
+import contextvars
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from backend.core.config import settings
+
+# Границы корзин гистограмм длительности, секунды
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин числа запросов к БД на HTTP-запрос
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Гистограмма с метками.
+
+    observe — один bisect и два сложения; накопительные суммы по корзинам
+    считаются только при выдаче /metrics.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Метки -> [число в каждой корзине (+Inf последней), сумма, количество]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                le = 'le="' + _number(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(float(total))}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class RequestStats:
+    """Запросы к БД в рамках одного HTTP-запроса"""
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    """Реестр метрик процесса и сборщики показателей компонентов (кэши, очереди, пулы)"""
+
+    def __init__(self, slow_query_seconds: float):
+        self.slow_query_seconds = slow_query_seconds
+        self.requests = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "HTTP request latency", ("method", "route"),
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries", "DB queries per HTTP request", ("route",), QUERY_COUNT_BUCKETS,
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_seconds", "Time spent in DB queries per HTTP request", ("route",),
+        )
+        self.query_duration = Histogram("db_query_duration_seconds", "DB query latency", ("engine",))
+        self.slow_queries = Counter("db_slow_queries_total", "DB queries slower than METRICS_SLOW_QUERY", ("engine",))
+        self.email_duration = Histogram("email_send_duration_seconds", "Email send latency", ("kind", "result"))
+        self.password_duration = Histogram(
+            "password_hash_duration_seconds", "Password hashing latency (queue + pbkdf2)", ("operation",),
+        )
+        self.admission_queue = Histogram(
+            "admission_queue_seconds", "Time waiting for a concurrency slot", ("route",),
+        )
+        self.admission_rejected = Counter(
+            "admission_rejected_total", "Requests rejected by admission control", ("route", "reason"),
+        )
+        self._metrics = [
+            self.requests,
+            self.request_duration,
+            self.request_queries,
+            self.request_db_time,
+            self.query_duration,
+            self.slow_queries,
+            self.email_duration,
+            self.password_duration,
+            self.admission_queue,
+            self.admission_rejected,
+        ]
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        # id маршрута роутера -> полный путь с префиксом (см. register_router);
+        # маршруты живут все время работы приложения, id не переиспользуются
+        self._route_labels: Dict[int, str] = {}
+
+    def register_collector(self, component: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Выдавать числовые поля stats() компонента как gauge balbus_<компонент>_<поле>"""
+        self._collectors[component] = stats
+
+    def register_router(self, router: Any, prefix: str) -> None:
+        """
+        Запомнить полные пути маршрутов роутера, подключенного с префиксом.
+
+        Новые версии FastAPI кладут в scope["route"] исходный маршрут роутера
+        с путем без префикса ("/" у /api/trips/ и /api/tickets/), поэтому
+        полный путь берется отсюда.
+        """
+        for route in router.routes:
+            path = getattr(route, "path_format", None)
+            if path is not None:
+                self._route_labels[id(route)] = prefix + path
+
+    def route_label(self, route: Any) -> str:
+        """Шаблон пути маршрута для меток метрик"""
+        if route is None:
+            return "unmatched"
+        label = self._route_labels.get(id(route))
+        if label is None:
+            label = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+        return label
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        self.requests.inc(method, route, status)
+        self.request_duration.observe(seconds, method, route)
+        self.request_queries.observe(stats.queries, route)
+        self.request_db_time.observe(stats.db_seconds, route)
+
+    def observe_query(self, engine: str, seconds: float) -> None:
+        self.query_duration.observe(seconds, engine)
+        if seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(engine)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += seconds
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for component, stats in self._collectors.items():
+            for key, value in stats().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"balbus_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(slow_query_seconds=settings.METRICS_SLOW_QUERY)
+
+
+def instrument_engine(async_engine, name: str) -> None:
+    """Замер каждого запроса к БД (before/after_cursor_execute)"""
+    if not settings.METRICS_ENABLED:
+        return
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info.pop("query_started_at", None)
+        if started_at is not None:
+            metrics.observe_query(name, time.perf_counter() - started_at)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: задержка, статус и запросы к БД по каждому маршруту.
+
+    Маршрут берется из шаблона пути (/api/trips/{trip_id}), а не из URL,
+    чтобы число рядов метрик не росло с числом рейсов.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            _request_stats.reset(token)
+            route = metrics.route_label(scope.get("route"))
+            metrics.observe_request(scope["method"], route, status_code, elapsed, stats)
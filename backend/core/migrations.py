@@ -0,0 +1,168 @@
+"""
+Версия схемы БД и миграции
+"""
+import logging
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    Index,
+    Integer,
+    Table,
+    UniqueConstraint,
+    case,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import AddConstraint, CreateColumn
+
+from backend.core.database import Base
+import backend.models  # noqa: F401  (все таблицы в Base.metadata)
+
+logger = logging.getLogger(__name__)
+
+# Текущая версия схемы. При изменении моделей увеличьте ее и добавьте
+# функцию, переводящую схему из предыдущей версии (декоратор _migration).
+SCHEMA_VERSION = 1
+
+# Версия -> миграция с предыдущей версии (выполняется в одной транзакции
+# вместе с записью новой версии)
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {}
+
+schema_version_table = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, nullable=False),
+)
+
+# Столбцы, добавленные к таблицам исходной схемы (до появления версий)
+BASELINE_NEW_COLUMNS = {
+    "trips": ("origin_city_id", "destination_city_id", "capacity", "seats_available"),
+    "tickets": ("seat_number",),
+}
+
+
+def _migration(version: int):
+    def register(func: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        MIGRATIONS[version] = func
+        return func
+    return register
+
+
+@_migration(1)
+def _baseline_to_v1(conn: Connection) -> None:
+    """
+    Исходная схема (без schema_version) -> версия 1.
+
+    Новые таблицы создаются create_all, но он не меняет существующие:
+    недостающие столбцы, индексы и ограничения добавляются здесь. Каждый
+    шаг проверяет текущее состояние, поэтому миграция подходит и для БД,
+    созданных промежуточными версиями кода.
+    """
+    Base.metadata.create_all(conn)
+    inspector = inspect(conn)
+    sqlite = conn.dialect.name == "sqlite"
+
+    added = set()
+    for table_name, column_names in BASELINE_NEW_COLUMNS.items():
+        table = Base.metadata.tables[table_name]
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"))
+            added.add((table_name, name))
+            # SQLite не добавляет внешние ключи через ALTER TABLE
+            if not sqlite:
+                for foreign_key in column.foreign_keys:
+                    conn.execute(AddConstraint(foreign_key.constraint))
+
+    for table_name in BASELINE_NEW_COLUMNS:
+        table = Base.metadata.tables[table_name]
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(table_name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing:
+                # Уникальный индекс вместо ALTER TABLE ADD CONSTRAINT: работает и в SQLite
+                Index(constraint.name, *constraint.columns, unique=True).create(conn)
+
+    if ("trips", "seats_available") in added:
+        # Свободные места = вместимость минус уже проданные билеты; если продано
+        # больше вместимости по умолчанию, вместимость поднимается до проданного
+        trips = Base.metadata.tables["trips"]
+        tickets = Base.metadata.tables["tickets"]
+        sold = (
+            select(func.count())
+            .select_from(tickets)
+            .where(tickets.c.trip_id == trips.c.id)
+            .scalar_subquery()
+        )
+        # updated_at = updated_at: служебное заполнение не считается изменением рейса
+        conn.execute(update(trips).values(
+            capacity=case((sold > trips.c.capacity, sold), else_=trips.c.capacity),
+            updated_at=trips.c.updated_at,
+        ))
+        conn.execute(update(trips).values(seats_available=trips.c.capacity - sold, updated_at=trips.c.updated_at))
+
+    if not sqlite:
+        # SQLite не добавляет CHECK к существующей таблице; там инвариант
+        # держит условный UPDATE списания мест (см. backend/core/inventory.py)
+        existing = {constraint["name"] for constraint in inspector.get_check_constraints("trips")}
+        for constraint in Base.metadata.tables["trips"].constraints:
+            if isinstance(constraint, CheckConstraint) and constraint.name not in existing:
+                conn.execute(AddConstraint(constraint))
+
+
+def _current_version(conn: Connection) -> Optional[int]:
+    """Версия схемы: None — пустая БД, 0 — таблицы созданы до появления версий"""
+    inspector = inspect(conn)
+    if not inspector.has_table(schema_version_table.name):
+        return 0 if inspector.has_table("trips") else None
+    return conn.execute(select(schema_version_table.c.version)).scalar_one_or_none() or 0
+
+
+def _migrate(conn: Connection) -> int:
+    version = _current_version(conn)
+    if version == SCHEMA_VERSION:
+        return version
+
+    if version is None:
+        # Новая БД: все таблицы сразу в текущей версии
+        Base.metadata.create_all(conn)
+        conn.execute(schema_version_table.delete())
+        conn.execute(schema_version_table.insert().values(version=SCHEMA_VERSION))
+        logger.info(f"Схема БД создана, версия {SCHEMA_VERSION}")
+        return SCHEMA_VERSION
+
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Схема БД версии {version} новее приложения (ожидается {SCHEMA_VERSION})")
+
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[target](conn)
+        logger.info(f"Схема БД обновлена до версии {target}")
+    # Версия записывается в той же транзакции, только после всех миграций
+    schema_version_table.create(conn, checkfirst=True)
+    conn.execute(schema_version_table.delete())
+    conn.execute(schema_version_table.insert().values(version=SCHEMA_VERSION))
+    return SCHEMA_VERSION
+
+
+async def migrate(engine: AsyncEngine) -> int:
+    """
+    Привести схему БД к SCHEMA_VERSION
+
+    Если версия в БД совпадает с текущей, выполняется только чтение версии,
+    без create_all и просмотра всех таблиц.
+    """
+    async with engine.begin() as conn:
+        return await conn.run_sync(_migrate)
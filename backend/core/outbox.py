@@ -0,0 +1,218 @@
+"""
+Очередь исходящих писем: запись в транзакции покупки и фоновая отправка
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.core.config import settings
+from backend.core.database import AsyncSessionLocal
+from backend.core.email import send_ticket_email, send_tickets_email
+from backend.core.metrics import metrics
+from backend.models.email_outbox import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+SendFunc = Callable[[str, Dict[str, Any]], Awaitable[bool]]
+
+# Обработчики по типу письма: (email, данные) -> успешно ли отправлено
+EMAIL_SENDERS: Dict[str, SendFunc] = {
+    "ticket": send_ticket_email,
+    "ticket_batch": send_tickets_email,
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная задержка перед следующей попыткой"""
+    return min(settings.EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_DELAY)
+
+
+def enqueue_email(db: AsyncSession, kind: str, recipient: str, data: Dict[str, Any]) -> EmailOutbox:
+    """
+    Поставить письмо в очередь.
+
+    Запись добавляется в текущую сессию и фиксируется вместе с ней,
+    поэтому письмо появляется в очереди тогда и только тогда, когда
+    закоммичен сам билет.
+    """
+    message = EmailOutbox(
+        kind=kind,
+        recipient=recipient,
+        payload=json.dumps(data, ensure_ascii=False, default=str),
+        status="pending",
+        attempts=0,
+        next_attempt_at=_utcnow(),
+    )
+    db.add(message)
+    return message
+
+
+class OutboxWorker:
+    """
+    Пул асинхронных отправителей писем из таблицы email_outbox.
+
+    Опросчик выбирает письма с наступившим next_attempt_at и кладет их id
+    в ограниченную очередь, отправители забирают письмо условным UPDATE
+    (attempts = attempts + 1 при неизменном attempts) и продлевают
+    next_attempt_at на время аренды. Если процесс упадет во время отправки,
+    письмо снова станет доступным после окончания аренды.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        senders: Optional[Dict[str, SendFunc]] = None,
+        workers: int = settings.EMAIL_OUTBOX_WORKERS,
+        poll_interval: float = settings.EMAIL_OUTBOX_POLL_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.senders = senders if senders is not None else EMAIL_SENDERS
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue(maxsize=settings.EMAIL_OUTBOX_BATCH_SIZE)
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._queued: set = set()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def notify(self) -> None:
+        """Разбудить опросчик сразу после коммита нового письма"""
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._poll_loop(), name="outbox-poller"))
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._send_loop(), name=f"outbox-sender-{i}"))
+        logger.info(f"Outbox: запущено отправителей: {self.workers}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self._fetch_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox: ошибка опроса очереди: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _fetch_due(self) -> None:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(EmailOutbox.id)
+                .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= _utcnow())
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+            )
+            ids = result.scalars().all()
+        for message_id in ids:
+            if message_id in self._queued:
+                continue
+            self._queued.add(message_id)
+            await self._queue.put(message_id)
+
+    async def _send_loop(self) -> None:
+        while True:
+            message_id = await self._queue.get()
+            try:
+                await self.process(message_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox: ошибка обработки письма {message_id}: {e}", exc_info=True)
+            finally:
+                self._queued.discard(message_id)
+                self._queue.task_done()
+
+    async def _claim(self, session: AsyncSession, message_id: int) -> Optional[EmailOutbox]:
+        message = await session.get(EmailOutbox, message_id)
+        if message is None or message.status != "pending":
+            return None
+        result = await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message_id, EmailOutbox.attempts == message.attempts)
+            .values(
+                attempts=EmailOutbox.attempts + 1,
+                next_attempt_at=_utcnow() + timedelta(seconds=settings.EMAIL_SEND_LEASE),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        if result.rowcount != 1:
+            return None  # Письмо забрал другой воркер
+        await session.refresh(message)
+        return message
+
+    async def process(self, message_id: int) -> None:
+        """Отправить одно письмо и записать результат"""
+        async with self.session_factory() as session:
+            message = await self._claim(session, message_id)
+            if message is None:
+                return
+
+            sender = self.senders.get(message.kind)
+            error = None
+            if sender is None:
+                ok, error = False, f"Unknown email kind: {message.kind}"
+            else:
+                started_at = time.perf_counter()
+                try:
+                    ok = await sender(message.recipient, json.loads(message.payload))
+                except Exception as e:
+                    ok, error = False, str(e)
+                metrics.email_duration.observe(
+                    time.perf_counter() - started_at, message.kind, "sent" if ok else "error"
+                )
+
+            if ok:
+                message.status = "sent"
+                message.sent_at = _utcnow()
+                message.last_error = None
+                self.sent += 1
+            elif message.attempts >= settings.EMAIL_MAX_ATTEMPTS or sender is None:
+                message.status = "failed"
+                message.last_error = error or "send failed"
+                self.failed += 1
+                logger.error(f"Outbox: письмо {message.id} на {message.recipient} не отправлено после {message.attempts} попыток")
+            else:
+                delay = retry_delay(message.attempts)
+                message.next_attempt_at = _utcnow() + timedelta(seconds=delay)
+                message.last_error = error or "send failed"
+                self.retried += 1
+                logger.warning(f"Outbox: повтор письма {message.id} через {delay:.0f} с")
+            await session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+outbox_worker = OutboxWorker()
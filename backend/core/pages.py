@@ -0,0 +1,61 @@
+"""
+HTML-страницы, отрендеренные при запуске и сжатые заранее
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from backend.core.cache import etag_matches, make_etag
+from backend.core.compression import ENCODINGS, compress, encoded_etag, negotiate_encoding
+from backend.core.templates import template_env
+
+# Страницы без контекста шаблона
+PAGES = ("index.html", "register.html", "login.html")
+
+
+@dataclass(frozen=True)
+class StaticPage:
+    """Отрендеренная страница и ее сжатые представления"""
+    etag: str
+    bodies: Dict[Optional[str], bytes]  # Кодировка (None — без сжатия) -> тело
+
+
+def render_page(name: str) -> StaticPage:
+    body = template_env.get_template(name).render().encode()
+    bodies: Dict[Optional[str], bytes] = {None: body}
+    for encoding in ENCODINGS:
+        bodies[encoding] = compress(body, encoding)
+    return StaticPage(etag=make_etag(body), bodies=bodies)
+
+
+class PageStore:
+    """Готовые страницы; рендерятся при запуске (или при первом обращении)"""
+
+    def __init__(self):
+        self._pages: Dict[str, StaticPage] = {}
+
+    def load(self) -> None:
+        for name in PAGES:
+            self._pages[name] = render_page(name)
+
+    def get(self, name: str) -> StaticPage:
+        page = self._pages.get(name)
+        if page is None:
+            page = self._pages[name] = render_page(name)
+        return page
+
+    def response(self, name: str, request: Request) -> Response:
+        """Страница в подходящей кодировке, 304 — если у клиента актуальная версия"""
+        page = self.get(name)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        etag = encoded_etag(page.etag, encoding)
+        headers = {"ETag": etag, "Cache-Control": "public, no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=page.bodies[encoding], media_type="text/html; charset=utf-8", headers=headers)
+
+
+page_store = PageStore()
@@ -1,28 +1,148 @@
 """
 Функции безопасности
 """
-from passlib.context import CryptContext
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import jwt, JWTError
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
 from backend.core.config import settings
+from backend.core.metrics import metrics
 
-# Используем pbkdf2_sha256, чтобы избежать ограничений bcrypt на длину пароля
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context() -> "CryptContext":
+    """
+    Контекст passlib (импортируется при первом обращении, а не при запуске).
+
+    Используем pbkdf2_sha256, чтобы избежать ограничений bcrypt на длину пароля.
+    Хеши с другим числом раундов считаются устаревшими и обновляются при входе.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+        pbkdf2_sha256__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+        pbkdf2_sha256__max_rounds=settings.PASSWORD_HASH_ROUNDS,
+    )
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверка пароля"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Хеширование пароля"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+class HashQueueFull(Exception):
+    """Очередь хеширования переполнена"""
+
+
+class PasswordHasher:
+    """
+    Выполнение pbkdf2 вне цикла событий.
+
+    Хеширование занимает десятки миллисекунд CPU, поэтому идет в отдельном
+    пуле потоков (hashlib отпускает GIL). Семафор ограничивает число операций
+    в работе и в очереди, чтобы всплеск входов не копил бесконечный хвост.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwd-hash")
+            self._slots = asyncio.Semaphore(self.workers)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        self._ensure_started()
+        if self.waiting + self.running >= self.max_pending:
+            raise HashQueueFull()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        self.wait_seconds += started_at - queued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            finished_at = time.perf_counter()
+            self.run_seconds += finished_at - started_at
+            metrics.password_duration.observe(finished_at - queued_at, func.__name__)
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+            "run_seconds_total": round(self.run_seconds, 6),
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Хеширование пароля в пуле потоков"""
+    return await password_hasher.run(get_pwd_context().hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверка пароля в пуле потоков
+
+    Возвращает (верен ли пароль, новый хеш или None). Новый хеш выдается,
+    если сохраненный получен с устаревшими параметрами (например, другим
+    числом раундов) — его нужно записать пользователю.
+    """
+    return await password_hasher.run(get_pwd_context().verify_and_update, plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Создание JWT токена"""
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
@@ -32,9 +152,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> Optional[dict]:
     """Проверка JWT токена"""
+    from jose import jwt, JWTError
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError:
         return None
-
@@ -0,0 +1,11 @@
+"""
+Окружение шаблонов Jinja2 (страницы и письма)
+"""
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+# Одно окружение на процесс: шаблоны компилируются при первом get_template
+# и кэшируются. HTML экранируется, текстовые шаблоны (*.txt) — нет.
+template_env = Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=select_autoescape(["html"]),
+)
@@ -0,0 +1,171 @@
+"""
+Номера билетов: возрастающие во времени, без обращения к БД и согласования между процессами
+
+Номер — 64-битное число: 41 бит миллисекунд от EPOCH_MS, 10 бит процесса
+(4 бита TICKET_NODE_ID сервера и 6 бит слота процесса на сервере) и 12 бит
+счетчика в пределах миллисекунды. Разные процессы не могут получить один
+номер, а в одном процессе номера строго возрастают.
+
+Запись — BAL-XXXXX-XXXXX-XXXC: 13 символов base32 Крокфорда (без I, L, O, U)
+и контрольный символ Luhn mod 32. Алфавит идет по возрастанию ASCII,
+поэтому строки сортируются так же, как числа, и вставка в уникальный
+индекс идет в его конец.
+"""
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from backend.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: слот процесса по pid
+    fcntl = None
+
+# 2024-01-01T00:00:00Z: 41 бита миллисекунд хватает до 2093 года
+EPOCH_MS = 1704067200000
+
+TIMESTAMP_BITS = 41
+NODE_BITS = 4
+SLOT_BITS = 6
+SEQUENCE_BITS = 12
+WORKER_BITS = NODE_BITS + SLOT_BITS
+
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SLOT = (1 << SLOT_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+ID_LENGTH = 13  # ceil(64 / 5)
+PREFIX = "BAL-"
+
+
+def _checksum(digits: str) -> str:
+    """Контрольный символ Luhn mod 32: ловит любую замену одного символа и почти все перестановки соседних"""
+    factor, total = 2, 0
+    for char in reversed(digits):
+        addend = factor * DIGITS[char]
+        total += addend // 32 + addend % 32
+        factor = 3 - factor
+    return ALPHABET[-total % 32]
+
+
+def format_ticket_number(ticket_id: int) -> str:
+    digits = []
+    for _ in range(ID_LENGTH):
+        ticket_id, value = divmod(ticket_id, 32)
+        digits.append(ALPHABET[value])
+    body = "".join(reversed(digits))
+    body += _checksum(body)
+    return f"{PREFIX}{body[:5]}-{body[5:10]}-{body[10:]}"
+
+
+def parse_ticket_number(number: str) -> int:
+    """Число из номера билета; ValueError при неверном формате или контрольном символе"""
+    number = number.strip().upper()
+    if not number.startswith(PREFIX):
+        raise ValueError("Неверный номер билета")
+    # Как принято в base32 Крокфорда: O читается как 0, I и L — как 1
+    body = number[len(PREFIX):].replace("-", "").replace("O", "0").replace("I", "1").replace("L", "1")
+    if len(body) != ID_LENGTH + 1 or any(char not in DIGITS for char in body):
+        raise ValueError("Неверный номер билета")
+    if _checksum(body[:-1]) != body[-1]:
+        raise ValueError("Неверный контрольный символ номера билета")
+    ticket_id = 0
+    for char in body[:-1]:
+        ticket_id = ticket_id * 32 + DIGITS[char]
+    if ticket_id >> 63:
+        raise ValueError("Неверный номер билета")
+    return ticket_id
+
+
+def split_ticket_id(ticket_id: int) -> Tuple[int, int, int]:
+    """(время в мс Unix, номер процесса, счетчик)"""
+    sequence = ticket_id & MAX_SEQUENCE
+    worker = (ticket_id >> SEQUENCE_BITS) & ((1 << WORKER_BITS) - 1)
+    timestamp = (ticket_id >> (SEQUENCE_BITS + WORKER_BITS)) + EPOCH_MS
+    return timestamp, worker, sequence
+
+
+def acquire_slot(lock_dir: str) -> Tuple[int, Optional[int]]:
+    """
+    Свободный слот процесса на этом сервере: эксклюзивная блокировка файла
+    balbus-ticket-<слот>.lock. Блокировку снимает ОС при завершении процесса,
+    поэтому слот перезапущенного воркера освобождается без очистки.
+    """
+    if fcntl is None:
+        return os.getpid() & MAX_SLOT, None
+    os.makedirs(lock_dir, exist_ok=True)
+    for slot in range(MAX_SLOT + 1):
+        fd = os.open(os.path.join(lock_dir, f"balbus-ticket-{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return slot, fd
+    raise RuntimeError(f"Нет свободного слота номеров билетов в {lock_dir} (максимум {MAX_SLOT + 1} процессов)")
+
+
+class TicketNumberGenerator:
+    """
+    Генератор номеров билетов (snowflake).
+
+    Слот процесса занимается при первом номере — уже в воркере, а не в
+    главном процессе. Если часы пошли назад, номера продолжают выдаваться
+    от последней использованной миллисекунды.
+    """
+
+    def __init__(self, node_id: int, lock_dir: str, worker_id: Optional[int] = None):
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f"TICKET_NODE_ID должен быть от 0 до {MAX_NODE}")
+        self.node_id = node_id
+        self.lock_dir = lock_dir
+        self.worker_id = worker_id
+        self._lock_fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._last_ms = -1
+        self._sequence = 0
+        self.generated = 0
+        self.clock_waits = 0
+
+    def _ensure_worker(self) -> int:
+        # После fork слот родителя не наследуется: дочерний процесс занимает свой
+        if self._pid != os.getpid():
+            if self._pid is not None or self.worker_id is None:
+                slot, self._lock_fd = acquire_slot(self.lock_dir)
+                self.worker_id = (self.node_id << SLOT_BITS) | slot
+            self._pid = os.getpid()
+            self._last_ms, self._sequence = -1, 0
+        return self.worker_id
+
+    def next_id(self) -> int:
+        worker_id = self._ensure_worker()
+        now = time.time_ns() // 1_000_000 - EPOCH_MS
+        if now > self._last_ms:
+            self._last_ms, self._sequence = now, 0
+        else:
+            # Та же миллисекунда или часы пошли назад
+            self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+            if self._sequence == 0:
+                # Счетчик миллисекунды исчерпан: ждем следующую
+                self.clock_waits += 1
+                while now <= self._last_ms:
+                    now = time.time_ns() // 1_000_000 - EPOCH_MS
+                    if now < self._last_ms:
+                        # Часы отстают: занимаем следующую миллисекунду
+                        now = self._last_ms + 1
+                self._last_ms = now
+        self.generated += 1
+        return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next_number(self) -> str:
+        return format_ticket_number(self.next_id())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"worker_id": self.worker_id, "generated": self.generated, "clock_waits": self.clock_waits}
+
+
+ticket_numbers = TicketNumberGenerator(settings.TICKET_NODE_ID, settings.TICKET_LOCK_DIR or tempfile.gettempdir())
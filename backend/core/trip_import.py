@@ -0,0 +1,165 @@
+"""
+Массовый импорт рейсов: разбор CSV/NDJSON, генерация по расписанию, вставка пачками
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+from zoneinfo import ZoneInfo
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.cities import get_or_create_city
+from backend.core.config import settings
+from backend.models.trip import Trip
+from backend.schemas.trip import TripCreate, TripSchedule, BulkImportError, BulkImportResult
+
+# Строка импорта: (номер строки, данные) или (номер строки, текст ошибки разбора)
+ImportRow = Tuple[int, Union[Dict[str, Any], str]]
+
+
+def parse_csv(raw: bytes) -> Iterator[ImportRow]:
+    """Строки CSV с заголовком origin,destination,departure_time,arrival_time,price[,capacity]"""
+    reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+    # Номер строки в файле: заголовок — первая строка
+    for number, row in enumerate(reader, start=2):
+        yield number, {key: value for key, value in row.items() if key and value not in (None, "")}
+
+
+def parse_ndjson(raw: bytes) -> Iterator[ImportRow]:
+    """Строки NDJSON: по объекту рейса на строку"""
+    for number, line in enumerate(raw.decode("utf-8-sig").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(item, dict):
+            yield number, "Expected a JSON object"
+            continue
+        yield number, item
+
+
+def count_csv_rows(raw: bytes) -> int:
+    """Число строк данных, которые выдаст parse_csv (без заголовка и пустых строк)"""
+    rows = sum(1 for row in csv.reader(io.StringIO(raw.decode("utf-8-sig"))) if row)
+    return max(rows - 1, 0)
+
+
+def count_ndjson_rows(raw: bytes) -> int:
+    """Число непустых строк, которые разберет parse_ndjson"""
+    return sum(1 for line in raw.splitlines() if line.strip())
+
+
+def schedule_size(schedule: TripSchedule) -> int:
+    """Число рейсов, которое сгенерирует правило"""
+    days = (schedule.date_to - schedule.date_from).days + 1
+    if days <= 0:
+        return 0
+    weeks, rest = divmod(days, 7)
+    weekdays = set(schedule.weekdays)
+    matching = weeks * len(weekdays) + sum(
+        1 for i in range(rest) if (schedule.date_from.weekday() + i) % 7 in weekdays
+    )
+    return matching * len(schedule.departure_times)
+
+
+def expand_schedule(schedule: TripSchedule) -> Iterator[ImportRow]:
+    """Рейсы по правилу повторения (время — в часовом поясе расписания)"""
+    tz = ZoneInfo(settings.TIMEZONE)
+    duration = timedelta(minutes=schedule.duration_minutes)
+    weekdays = set(schedule.weekdays)
+    number = 0
+    day = schedule.date_from
+    while day <= schedule.date_to:
+        if day.weekday() in weekdays:
+            for departure in schedule.departure_times:
+                number += 1
+                departure_time = datetime.combine(day, departure, tzinfo=tz)
+                yield number, {
+                    "origin": schedule.origin,
+                    "destination": schedule.destination,
+                    "departure_time": departure_time,
+                    "arrival_time": departure_time + duration,
+                    "price": schedule.price,
+                    "capacity": schedule.capacity,
+                }
+        day += timedelta(days=1)
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+async def _insert_chunk(db: AsyncSession, chunk: List[TripCreate], city_ids: Dict[str, int]) -> None:
+    values = []
+    for trip in chunk:
+        for name in (trip.origin, trip.destination):
+            if name not in city_ids:
+                city_ids[name] = await get_or_create_city(db, name)
+        values.append({
+            **trip.model_dump(),
+            "seats_available": trip.capacity,
+            "origin_city_id": city_ids[trip.origin],
+            "destination_city_id": city_ids[trip.destination],
+        })
+    # Один executemany на пачку вместо add/commit/refresh на каждую строку
+    await db.execute(insert(Trip), values)
+    await db.commit()
+
+
+async def import_trips(db: AsyncSession, rows: Iterable[ImportRow]) -> BulkImportResult:
+    """
+    Проверка и вставка рейсов пачками по BULK_IMPORT_CHUNK_SIZE.
+
+    Каждая пачка фиксируется отдельной транзакцией; строки с ошибками
+    пропускаются и попадают в отчет.
+    """
+    created = 0
+    failed = 0
+    errors: List[BulkImportError] = []
+    chunk: List[TripCreate] = []
+    city_ids: Dict[str, int] = {}
+
+    def add_error(number: int, detail: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < settings.BULK_IMPORT_MAX_ERRORS:
+            errors.append(BulkImportError(row=number, detail=detail))
+
+    for number, row in rows:
+        if isinstance(row, str):
+            add_error(number, row)
+            continue
+        try:
+            trip = TripCreate.model_validate(row)
+        except ValidationError as e:
+            add_error(number, _format_validation_error(e))
+            continue
+        try:
+            valid_times = trip.arrival_time > trip.departure_time
+        except TypeError:
+            add_error(number, "departure_time and arrival_time must both have or both omit a timezone")
+            continue
+        if not valid_times:
+            add_error(number, "arrival_time must be later than departure_time")
+            continue
+        chunk.append(trip)
+        if len(chunk) >= settings.BULK_IMPORT_CHUNK_SIZE:
+            await _insert_chunk(db, chunk, city_ids)
+            created += len(chunk)
+            chunk = []
+
+    if chunk:
+        await _insert_chunk(db, chunk, city_ids)
+        created += len(chunk)
+
+    return BulkImportResult(created=created, failed=failed, errors=errors)
@@ -0,0 +1,133 @@
+"""
+Кэш пользователей, проверенных по JWT
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+from backend.core.config import settings
+from backend.models.user import User
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Снимок пользователя для обработчиков запросов (без привязки к сессии БД)"""
+    id: int
+    email: str
+    username: str
+    full_name: Optional[str]
+    is_active: bool
+    is_dispatcher: bool
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            is_dispatcher=user.is_dispatcher,
+            created_at=user.created_at,
+        )
+
+
+class UserCache:
+    """
+    LRU-кэш «токен → снимок пользователя» с коротким TTL.
+
+    Запись живет не дольше TTL и не дольше срока действия самого токена.
+    При деактивации пользователя или смене роли все его токены удаляются
+    из кэша (см. обработчик after_update ниже) — только в процессе, который
+    выполнил изменение. Остальные воркеры (run.py --prod) видят старую роль
+    или удаленного пользователя до USER_CACHE_TTL секунд.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[CurrentUser, float]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        item = self._data.get(token)
+        if item is None:
+            self.misses += 1
+            return None
+        user, expires_at = item
+        if expires_at <= time.monotonic():
+            self._remove(token)
+            self.misses += 1
+            return None
+        self._data.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user: CurrentUser, token_exp: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        self._remove(token)
+        self._data[token] = (user, time.monotonic() + ttl)
+        self._tokens_by_user.setdefault(user.id, set()).add(token)
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+
+    def _remove(self, token: str) -> None:
+        item = self._data.pop(token, None)
+        if item is None:
+            return
+        tokens = self._tokens_by_user.get(item[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[item[0].id]
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Удалить из кэша все токены пользователя"""
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._remove(token)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tokens_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    """Сброс кэша при деактивации пользователя или смене роли"""
+    state = inspect(target)
+    if state.attrs.is_active.history.has_changes() or state.attrs.is_dispatcher.history.has_changes():
+        user_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: User) -> None:
+    user_cache.invalidate_user(target.id)
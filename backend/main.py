@@ -3,13 +3,20 @@ FastAPI приложение с регистрацией
 """
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from jinja2 import Environment, FileSystemLoader
 import os
 import logging
 
-from backend.core.database import engine, Base
+from backend.core.config import settings
+from backend.core.database import engine, AsyncSessionLocal, read_router
+from backend.core.metrics import metrics, MetricsMiddleware
+from backend.core.cities import load_city_index
+from backend.core.email import load_email_templates, smtp_pool
+from backend.core.events import event_hub
+from backend.core.outbox import outbox_worker
+from backend.core.pages import page_store
+from backend.core.security import password_hasher
 from backend.api.auth import router as auth_router
 from backend.api.trips import router as trips_router
 from backend.api.tickets import router as tickets_router
@@ -28,55 +35,138 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Задержка и запросы к БД по маршрутам (GET /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Подключение статических файлов (если директория существует)
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Подключение шаблонов
-template_env = Environment(loader=FileSystemLoader("templates"))
-
 # Подключение роутеров
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
 app.include_router(trips_router, prefix="/api/trips", tags=["trips"])
 app.include_router(tickets_router, prefix="/api/tickets", tags=["tickets"])
+for prefix, router in (("/api/auth", auth_router), ("/api/trips", trips_router), ("/api/tickets", tickets_router)):
+    metrics.register_router(router, prefix)
 
 
-@app.on_event("startup")
-async def startup():
-    """Создание таблиц при запуске"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+async def load_cities():
+    """Загрузка справочника городов в память процесса"""
+    try:
+        async with AsyncSessionLocal() as session:
+            await load_city_index(session)
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить справочник городов: {e}")
+
+
+async def prepare_database():
+    """
+    Однократная подготовка БД: таблицы, тестовые данные, обслуживание
+
+    В продакшен-режиме (run.py --prod) выполняется один раз в главном
+    процессе до запуска воркеров, в разработке — при старте приложения.
+    """
+    # Схема: при актуальной версии — одно чтение schema_version
+    from backend.core.migrations import migrate
+    await migrate(engine)
     
     # Заполнение тестовыми данными
+    if settings.SEED_DEMO_DATA:
+        try:
+            from backend.api.seed import seed_trips
+            await seed_trips()
+        except Exception as e:
+            logger.warning(f"Не удалось заполнить тестовые данные: {e}")
+
+    # Привязка рейсов к справочнику городов
+    await load_cities()
+
+    # Удаление устаревших ключей идемпотентности
     try:
-        from backend.api.seed import seed_trips
-        await seed_trips()
+        from backend.core.idempotency import idempotency_store
+        async with AsyncSessionLocal() as session:
+            await idempotency_store.purge_expired(session)
     except Exception as e:
-        logger.warning(f"Не удалось заполнить тестовые данные: {e}")
+        logger.warning(f"Не удалось очистить ключи идемпотентности: {e}")
+
+
+@app.on_event("startup")
+async def startup():
+    """Подготовка БД (если ее не выполнил главный процесс) и запуск фоновых задач"""
+    if not settings.DB_PREPARED:
+        await prepare_database()
+    else:
+        # Справочник городов в память воркера
+        await load_cities()
+
+    # Страницы рендерятся и сжимаются один раз
+    page_store.load()
+    # Шаблоны писем компилируются, обертка письма с билетом кодируется один раз
+    load_email_templates()
+
+    # Фоновая отправка писем из очереди
+    await outbox_worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Остановка фоновых задач"""
+    event_hub.close()
+    await outbox_worker.stop()
+    await smtp_pool.close()
+    password_hasher.shutdown()
 
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Главная страница"""
-    template = template_env.get_template("index.html")
-    return HTMLResponse(content=template.render())
+    return page_store.response("index.html", request)
 
 
 @app.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
     """Страница регистрации"""
-    template = template_env.get_template("register.html")
-    return HTMLResponse(content=template.render())
+    return page_store.response("register.html", request)
 
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     """Страница входа"""
-    template = template_env.get_template("login.html")
-    return HTMLResponse(content=template.render())
+    return page_store.response("login.html", request)
 
 
 @app.get("/health")
 async def health():
     """Проверка здоровья сервиса"""
     return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _register_metric_collectors() -> None:
+    """Показатели кэшей, очередей и пулов в /metrics"""
+    from backend.core.admission import admission_control
+    from backend.core.board import departure_board
+    from backend.core.cache import schedule_cache
+    from backend.core.idempotency import idempotency_store
+    from backend.core.ticket_numbers import ticket_numbers
+    from backend.core.user_cache import user_cache
+
+    metrics.register_collector("schedule_cache", schedule_cache.stats)
+    metrics.register_collector("departure_board", departure_board.stats)
+    metrics.register_collector("user_cache", user_cache.stats)
+    metrics.register_collector("password_hasher", password_hasher.stats)
+    metrics.register_collector("outbox", outbox_worker.stats)
+    metrics.register_collector("events", event_hub.stats)
+    metrics.register_collector("idempotency", idempotency_store.stats)
+    metrics.register_collector("read_replica", read_router.stats)
+    metrics.register_collector("admission", admission_control.stats)
+    metrics.register_collector("ticket_numbers", ticket_numbers.stats)
+
+
+_register_metric_collectors()
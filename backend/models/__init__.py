@@ -1,6 +1,9 @@
 from backend.models.user import User
 from backend.models.trip import Trip
 from backend.models.ticket import Ticket
+from backend.models.city import City
+from backend.models.email_outbox import EmailOutbox
+from backend.models.idempotency_key import IdempotencyKey
 
-__all__ = ["User", "Trip", "Ticket"]
+__all__ = ["User", "Trip", "Ticket", "City", "EmailOutbox", "IdempotencyKey"]
 
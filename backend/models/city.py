@@ -0,0 +1,15 @@
+"""
+Модель населенного пункта (справочник остановок)
+"""
+from sqlalchemy import Column, Integer, String
+from backend.core.database import Base
+
+
+class City(Base):
+    """Город"""
+    __tablename__ = "cities"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    # Нормализованное имя: casefold, ё → е, одиночные пробелы
+    name_normalized = Column(String, unique=True, nullable=False, index=True)
@@ -0,0 +1,26 @@
+"""
+Модель очереди исходящих писем (outbox)
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+from backend.core.database import Base
+
+
+class EmailOutbox(Base):
+    """Письмо, ожидающее отправки фоновым воркером"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # Выборка воркером: pending-письма с наступившим временем попытки
+        Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # Тип письма, например "ticket"
+    recipient = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON с данными для шаблона
+    status = Column(String, nullable=False, default="pending")  # pending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
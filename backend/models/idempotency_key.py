@@ -0,0 +1,18 @@
+"""
+Модель сохраненных ответов по ключу идемпотентности
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy.sql import func
+from backend.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """Ответ на запрос с заголовком Idempotency-Key (фиксируется в одной транзакции с покупкой)"""
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, unique=True, nullable=False)  # "<операция>:<ключ клиента>"
+    fingerprint = Column(String, nullable=False)  # Хэш тела запроса
+    status_code = Column(Integer, nullable=False)
+    response = Column(Text, nullable=False)  # JSON ответа
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -1,7 +1,7 @@
 """
 Модель билета
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from backend.core.database import Base
@@ -10,12 +10,16 @@ from backend.core.database import Base
 class Ticket(Base):
     """Билет на рейс"""
     __tablename__ = "tickets"
+    __table_args__ = (
+        UniqueConstraint("trip_id", "seat_number", name="uq_tickets_trip_seat"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False, index=True)
     full_name = Column(String, nullable=False)
     email = Column(String, nullable=False, index=True)
     price = Column(Float, nullable=False)
+    seat_number = Column(Integer, nullable=True)
     ticket_number = Column(String, unique=True, nullable=False, index=True)
     is_paid = Column(Boolean, default=False)  # Пока муляж, потом через Элплат
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,7 +1,7 @@
 """
 Модель рейса (расписание)
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Index, ForeignKey, CheckConstraint
 from sqlalchemy.sql import func
 from backend.core.database import Base
 
@@ -9,13 +9,23 @@ from backend.core.database import Base
 class Trip(Base):
     """Рейс"""
     __tablename__ = "trips"
+    __table_args__ = (
+        # Публичное расписание всегда фильтрует по is_active и диапазону дат
+        Index("ix_trips_active_departure", "is_active", "departure_time"),
+        CheckConstraint("seats_available >= 0 AND seats_available <= capacity", name="ck_trips_seats"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     origin = Column(String, nullable=False, index=True)
     destination = Column(String, nullable=False, index=True)
+    origin_city_id = Column(Integer, ForeignKey("cities.id"), nullable=True, index=True)
+    destination_city_id = Column(Integer, ForeignKey("cities.id"), nullable=True, index=True)
     departure_time = Column(DateTime(timezone=True), nullable=False, index=True)
     arrival_time = Column(DateTime(timezone=True), nullable=False)
     price = Column(Float, nullable=False)
+    capacity = Column(Integer, nullable=False, default=50, server_default="50")
+    # Меняется только атомарным UPDATE ... WHERE seats_available > 0
+    seats_available = Column(Integer, nullable=False, default=50, server_default="50")
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
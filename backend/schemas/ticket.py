@@ -3,7 +3,7 @@
 """
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class TicketCreate(BaseModel):
@@ -21,6 +21,7 @@ class TicketResponse(BaseModel):
     full_name: str
     email: str
     price: float
+    seat_number: Optional[int] = None
     ticket_number: str
     is_paid: bool
     created_at: datetime
@@ -28,3 +29,23 @@ class TicketResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class PassengerCreate(BaseModel):
+    """Пассажир в групповом заказе"""
+    trip_id: int
+    full_name: str = Field(..., min_length=2, max_length=200)
+    email: EmailStr
+
+
+class TicketBatchCreate(BaseModel):
+    """Схема группового заказа билетов"""
+    passengers: List[PassengerCreate] = Field(..., min_length=1, max_length=20)
+    contact_email: Optional[EmailStr] = Field(None, description="Email для общего письма (по умолчанию — email первого пассажира)")
+    consent_to_processing: bool = Field(..., description="Согласие на обработку персональных данных")
+
+
+class TicketBatchResponse(BaseModel):
+    """Схема ответа на групповой заказ"""
+    tickets: List[TicketResponse]
+    total_price: float
@@ -1,9 +1,12 @@
 """
 Схемы для рейсов
 """
-from pydantic import BaseModel, field_validator
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import date, datetime, time
+from typing import List, Optional
+
+# Pydantic на Python < 3.12 принимает только TypedDict из typing_extensions
+from typing_extensions import TypedDict
 
 
 class TripBase(BaseModel):
@@ -12,6 +15,7 @@ class TripBase(BaseModel):
     departure_time: datetime
     arrival_time: datetime
     price: float
+    capacity: int = Field(50, ge=1, le=1000)
     is_active: bool = True
     
     @field_validator("origin", "destination")
@@ -34,14 +38,89 @@ class TripUpdate(BaseModel):
     departure_time: Optional[datetime] = None
     arrival_time: Optional[datetime] = None
     price: Optional[float] = None
+    capacity: Optional[int] = Field(None, ge=1, le=1000)
     is_active: Optional[bool] = None
 
 
 class TripResponse(TripBase):
     id: int
+    origin_city_id: Optional[int] = None
+    destination_city_id: Optional[int] = None
+    seats_available: int
     created_at: datetime
     updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
 
+
+class TripRow(TypedDict):
+    """
+    Строка рейса для быстрой сериализации (поля и порядок — как в TripResponse).
+
+    Без валидаторов: используется только для данных, прочитанных из БД.
+    """
+    origin: str
+    destination: str
+    departure_time: datetime
+    arrival_time: datetime
+    price: float
+    capacity: int
+    is_active: bool
+    id: int
+    origin_city_id: Optional[int]
+    destination_city_id: Optional[int]
+    seats_available: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+
+
+class TripPage(BaseModel):
+    """Страница рейсов с курсором на следующую"""
+    items: List[TripResponse]
+    next_cursor: Optional[str] = None
+
+
+class CitySuggestion(BaseModel):
+    """Подсказка для автодополнения города"""
+    id: int
+    name: str
+
+
+class TripSchedule(BaseModel):
+    """Правило повторения для генерации рейсов"""
+    origin: str
+    destination: str
+    departure_times: List[time] = Field(..., min_length=1)
+    duration_minutes: int = Field(..., ge=1, le=7 * 24 * 60)
+    weekdays: List[int] = Field(default_factory=lambda: list(range(7)), description="0 — понедельник, 6 — воскресенье")
+    date_from: date
+    date_to: date
+    price: float
+    capacity: int = Field(50, ge=1, le=1000)
+
+    @field_validator("weekdays")
+    @classmethod
+    def validate_weekdays(cls, v: List[int]) -> List[int]:
+        if not v or any(day < 0 or day > 6 for day in v):
+            raise ValueError("Дни недели задаются числами от 0 до 6")
+        return sorted(set(v))
+
+    @model_validator(mode="after")
+    def validate_dates(self) -> "TripSchedule":
+        if self.date_from > self.date_to:
+            raise ValueError("Дата начала не может быть позже даты окончания")
+        return self
+
+
+class BulkImportError(BaseModel):
+    """Ошибка в строке импорта"""
+    row: int
+    detail: str
+
+
+class BulkImportResult(BaseModel):
+    """Результат массового импорта рейсов"""
+    created: int
+    failed: int
+    errors: List[BulkImportError]
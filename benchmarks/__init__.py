@@ -0,0 +1,3 @@
+"""
+Нагрузочные замеры API (см. benchmarks/run.py)
+"""
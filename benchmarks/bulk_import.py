@@ -0,0 +1,155 @@
+"""
+Время массового импорта рейсов через POST /api/trips/bulk
+
+Один запрос CSV на --rows рейсов, тот же объем правилом повторения
+(TripSchedule) и, для сравнения, --single рейсов по одному через
+POST /api/trips/ — как загружали расписание до массового импорта.
+Приложение запускается в процессе (httpx.ASGITransport) на новой базе
+SQLite; после прогона число рейсов в базе сверяется с ответами.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bulk_import --rows 100000 --output bulk.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import BENCH_PASSWORD, BENCH_USER, isolated_environment, login
+
+ROUTES = [
+    ("Москва", "Тверь"),
+    ("Москва", "Ярославль"),
+    ("Санкт-Петербург", "Великий Новгород"),
+    ("Казань", "Набережные Челны"),
+]
+
+
+def build_csv(rows: int, start: datetime) -> bytes:
+    lines = ["origin,destination,departure_time,arrival_time,price,capacity"]
+    for i in range(rows):
+        origin, destination = ROUTES[i % len(ROUTES)]
+        departure = start + timedelta(minutes=10 * i)
+        arrival = departure + timedelta(hours=3)
+        lines.append(f"{origin},{destination},{departure.isoformat()},{arrival.isoformat()},{1000 + i % 500},50")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def build_schedule(rows: int, start: date) -> Dict[str, Any]:
+    """Правило на ~rows рейсов: 48 отправлений в сутки каждый день"""
+    per_day = 48
+    return {
+        "origin": "Москва",
+        "destination": "Тверь",
+        "departure_times": [f"{i // 2:02d}:{30 * (i % 2):02d}" for i in range(per_day)],
+        "duration_minutes": 180,
+        "date_from": start.isoformat(),
+        "date_to": (start + timedelta(days=math.ceil(rows / per_day) - 1)).isoformat(),
+        "price": 1000.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    import httpx
+    from sqlalchemy import func, select
+
+    from backend.api.seed import seed_user
+    from backend.core.database import AsyncSessionLocal, engine
+    from backend.main import app
+    from backend.models.trip import Trip
+
+    logging.disable(logging.WARNING)
+    start = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    results: Dict[str, Any] = {}
+
+    async with app.router.lifespan_context(app):
+        await seed_user(BENCH_USER, BENCH_PASSWORD, is_dispatcher=True)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600.0) as client:
+            auth = {"Authorization": f"Bearer {await login(client)}"}
+
+            body = build_csv(args.rows, start)
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/trips/bulk", content=body, headers={**auth, "Content-Type": "text/csv"},
+            )
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            created = response.json()["created"]
+            results["csv"] = {
+                "rows": args.rows,
+                "created": created,
+                "body_bytes": len(body),
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_second": round(created / elapsed, 1),
+            }
+
+            schedule = build_schedule(args.rows, start.date() + timedelta(days=400))
+            started = time.perf_counter()
+            response = await client.post("/api/trips/bulk", json=schedule, headers=auth)
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            created = response.json()["created"]
+            results["schedule"] = {
+                "created": created,
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_second": round(created / elapsed, 1),
+            }
+
+            created = 0
+            started = time.perf_counter()
+            for i in range(args.single):
+                departure = start + timedelta(days=800, minutes=10 * i)
+                response = await client.post("/api/trips/", headers=auth, json={
+                    "origin": "Москва",
+                    "destination": "Тверь",
+                    "departure_time": departure.isoformat(),
+                    "arrival_time": (departure + timedelta(hours=3)).isoformat(),
+                    "price": 1000.0,
+                })
+                created += response.status_code == 200
+            elapsed = time.perf_counter() - started
+            results["one_by_one"] = {
+                "created": created,
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_second": round(created / elapsed, 1) if elapsed else 0.0,
+            }
+
+        async with AsyncSessionLocal() as session:
+            stored = await session.scalar(select(func.count(Trip.id)))
+    await engine.dispose()
+
+    expected = sum(row["created"] for row in results.values())
+    return {"modes": results, "stored": stored, "ok": stored == expected and results["csv"]["created"] == args.rows}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Массовый импорт рейсов")
+    parser.add_argument("--rows", type=int, default=100000, help="Рейсов в одном запросе импорта")
+    parser.add_argument("--single", type=int, default=1000, help="Рейсов по одному через POST /api/trips/")
+    parser.add_argument("--database-url", help="База для прогона (по умолчанию — новый файл SQLite)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    isolated_environment("bulk", args.database_url)
+
+    results = asyncio.run(run(args))
+
+    for mode, row in results["modes"].items():
+        print(f"{mode:<12} {row['created']:>8} trips  {row['elapsed_s']:>9} s  {row['rows_per_second']:>10} trips/s")
+    print(f"{'stored':<12} {results['stored']:>8} trips  {'ok' if results['ok'] else 'MISMATCH'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0 if results["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Задержка расписания на день при одновременных зрителях
+
+--viewers клиентов одновременно запрашивают рейсы на сегодня
+(GET /api/trips/?departure_date=..., как главная страница). Сравниваются:
+- board — ответ из табло отправлений, как в приложении (первый запрос
+  строит табло, остальные ждут его и получают готовые байты);
+- query — табло заменено сквозным вызовом: каждый запрос выполняет
+  запрос к БД и сериализацию, как до появления табло.
+Для каждого числа зрителей и режима — p50/p99/max, время всей волны и
+число ошибок (например, 500 по таймауту пула соединений).
+
+Запуск из корня репозитория:
+    python -m benchmarks.departure_board --viewers 1000 --viewers 10000 --output board.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import isolated_environment, percentile
+
+MODES = ("board", "query")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    import httpx
+
+    from backend.api.seed import seed_synthetic_trips
+    from backend.core.board import departure_board
+    from backend.core.cache import CacheEntry, make_etag
+    from backend.core.database import engine
+    from backend.main import app
+
+    logging.disable(logging.WARNING)
+    url = f"/api/trips/?departure_date={date.today().isoformat()}"
+    board_get = departure_board.get
+
+    async def uncached(day, loader) -> CacheEntry:
+        body, _ = await loader(day)
+        return CacheEntry(body=body, etag=make_etag(body), version=0, expires_at=0.0)
+
+    async def wave(client, viewers: int) -> Dict[str, Any]:
+        latencies: List[float] = []
+        errors = 0
+        body_bytes = 0
+
+        async def viewer() -> None:
+            nonlocal errors, body_bytes
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            body_bytes = len(response.content)
+
+        departure_board.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(viewer() for _ in range(viewers)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "viewers": viewers,
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            "wave_s": round(elapsed, 3),
+            "body_bytes": body_bytes,
+        }
+
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        await seed_synthetic_trips(args.trips, args.days)
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            # Прогрев: шаблоны, кэши адаптеров, соединения пула
+            await wave(client, 10)
+            for viewers in args.viewers:
+                for mode in args.modes:
+                    departure_board.get = board_get if mode == "board" else uncached
+                    try:
+                        results[f"{mode}_{viewers}"] = {"mode": mode, **await wave(client, viewers)}
+                    finally:
+                        departure_board.get = board_get
+    await engine.dispose()
+    return {"trips": args.trips, "days": args.days, "waves": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Расписание на день при одновременных зрителях")
+    parser.add_argument("--viewers", type=int, action="append", help="Одновременных зрителей (можно несколько раз)")
+    parser.add_argument("--mode", dest="modes", action="append", choices=MODES, help="Режим (по умолчанию — оба)")
+    parser.add_argument("--trips", type=int, default=10000, help="Синтетических рейсов в базе")
+    parser.add_argument("--days", type=int, default=30, help="На сколько дней распределить рейсы")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Таймаут запроса клиента, секунды")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+    args.viewers = args.viewers or [1000, 10000]
+    args.modes = args.modes or list(MODES)
+
+    isolated_environment("board")
+
+    results = asyncio.run(run(args))
+
+    print(f"{results['trips']} trips over {results['days']} days")
+    for name, row in results["waves"].items():
+        print(
+            f"{name:<14} p50 {row['p50_ms']:>10} ms  p99 {row['p99_ms']:>10} ms  max {row['max_ms']:>10} ms  "
+            f"wave {row['wave_s']:>8} s  errors {row['errors']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
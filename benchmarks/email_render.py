@@ -0,0 +1,80 @@
+"""
+Микробенчмарк сборки писем с билетом
+
+Считается, сколько писем в секунду дают этапы подготовки письма:
+- render — render_ticket_email (тема, текст и HTML в готовой обертке);
+- build — build_ticket_message (рендеринг + MIMEMultipart);
+- serialize — build + as_bytes(), то есть байты, как уходят на SMTP.
+
+Запуск из корня репозитория:
+    python -m benchmarks.email_render --count 20000 --output render.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SAMPLE_TICKET: Dict[str, Any] = {
+    "ticket_number": "BB-000000001",
+    "full_name": "Иванов Иван Иванович",
+    "trip_origin": "Москва",
+    "trip_destination": "Тверь",
+    "departure_time": "19.10.2026 08:00",
+    "arrival_time": "19.10.2026 11:00",
+    "price": 1000.0,
+    "seat_number": 1,
+}
+
+
+def measure(func: Callable[[int], Any], count: int, runs: int) -> Dict[str, Any]:
+    """Лучший из `runs` прогонов по `count` вызовов"""
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        for i in range(count):
+            func(i)
+        best = min(best, time.perf_counter() - started)
+    return {"per_second": round(count / best, 1), "us_per_call": round(best / count * 1e6, 2)}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    from backend.core.email import build_ticket_message, load_email_templates, render_ticket_email
+
+    stages = {
+        "render": lambda i: render_ticket_email(SAMPLE_TICKET),
+        "build": lambda i: build_ticket_message(f"passenger{i}@example.com", SAMPLE_TICKET),
+        "serialize": lambda i: build_ticket_message(f"passenger{i}@example.com", SAMPLE_TICKET).as_bytes(),
+    }
+    # Как при запуске приложения
+    load_email_templates()
+    return {
+        "count": args.count,
+        "stages": {name: measure(func, args.count, args.runs) for name, func in stages.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сборка писем с билетом")
+    parser.add_argument("--count", type=int, default=20000, help="Писем в одном прогоне")
+    parser.add_argument("--runs", type=int, default=3, help="Прогонов каждого этапа (берется лучший)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    os.environ["SMTP_USER"] = "bench@example.com"
+
+    results = run(args)
+
+    for name, row in results["stages"].items():
+        print(f"{name:<10} {row['per_second']:>10} /s  {row['us_per_call']:>8} us")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Пропускная способность отправки писем на локальный SMTP-муляж
+
+Муляж — минимальный SMTP-сервер на asyncio (EHLO, AUTH, MAIL, RCPT, DATA,
+NOOP, RSET, QUIT), который считает принятые письма; --rtt-ms добавляет
+задержку перед каждым ответом, как у удаленного сервера. Сравниваются:
+- per_message — прежний способ: соединение и логин на каждое письмо;
+- pool — smtp_pool.send на каждое письмо (постоянные соединения);
+- send_many — smtp_pool.send_many пачками по --batch писем.
+Одновременно работают не больше SMTP_POOL_SIZE соединений во всех режимах.
+Письма собираются заранее, в замер входит только отправка. TLS муляж не
+поддерживает, так что выигрыш пула на реальном сервере только больше.
+
+Запуск из корня репозитория:
+    python -m benchmarks.email_send --messages 2000 --rtt-ms 5 --output email.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.email_render import SAMPLE_TICKET
+
+MODES = ("per_message", "pool", "send_many")
+
+
+class SMTPStub:
+    """SMTP-сервер, который принимает любые письма и только считает их"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.messages = 0
+        self.connections = 0
+
+    async def _reply(self, writer: asyncio.StreamWriter, text: str) -> None:
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        writer.write(text.encode("ascii") + b"\r\n")
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            await self._reply(writer, "220 stub ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].decode("ascii", "replace").upper()
+                if command == "EHLO":
+                    await self._reply(writer, "250-stub\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+                elif command == "HELO":
+                    await self._reply(writer, "250 stub")
+                elif command == "AUTH":
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif command == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    await reader.readuntil(b"\r\n.\r\n")
+                    self.messages += 1
+                    await self._reply(writer, "250 2.0.0 Ok: queued")
+                elif command == "QUIT":
+                    await self._reply(writer, "221 2.0.0 Bye")
+                    break
+                else:
+                    # MAIL, RCPT, NOOP, RSET
+                    await self._reply(writer, "250 2.0.0 Ok")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run(args: argparse.Namespace, sock: socket.socket) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    import aiosmtplib
+
+    from backend.core.config import settings
+    from backend.core.email import SMTPPool, build_ticket_messages
+
+    logging.disable(logging.WARNING)
+    stub = SMTPStub(args.rtt_ms / 1000)
+    server = await asyncio.start_server(stub.handle, sock=sock)
+
+    messages = build_ticket_messages(
+        [(f"passenger{i}@example.com", SAMPLE_TICKET) for i in range(args.messages)]
+    )
+    slots = asyncio.Semaphore(settings.SMTP_POOL_SIZE)
+
+    async def per_message(message) -> None:
+        async with slots:
+            async with aiosmtplib.SMTP(
+                hostname=settings.SMTP_HOST, port=settings.SMTP_PORT, use_tls=False, start_tls=False,
+            ) as smtp:
+                await smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+                await smtp.send_message(message)
+
+    results: Dict[str, Any] = {}
+    for mode in args.modes:
+        pool = SMTPPool(settings.SMTP_POOL_SIZE, settings.SMTP_IDLE_TIMEOUT, settings.SMTP_KEEPALIVE_INTERVAL)
+        received_before, connections_before = stub.messages, stub.connections
+        started = time.perf_counter()
+        if mode == "per_message":
+            await asyncio.gather(*(per_message(message) for message in messages))
+            failed = 0
+        elif mode == "pool":
+            await asyncio.gather(*(pool.send(message) for message in messages))
+            failed = 0
+        else:
+            batches = [messages[i:i + args.batch] for i in range(0, len(messages), args.batch)]
+            errors = await asyncio.gather(*(pool.send_many(batch) for batch in batches))
+            failed = sum(error is not None for batch_errors in errors for error in batch_errors)
+        elapsed = time.perf_counter() - started
+        await pool.close()
+        received = stub.messages - received_before
+        results[mode] = {
+            "messages": args.messages,
+            "received": received,
+            "failed": failed,
+            "connections": stub.connections - connections_before,
+            "elapsed_s": round(elapsed, 3),
+            "messages_per_second": round(received / elapsed, 1) if elapsed else 0.0,
+        }
+
+    server.close()
+    await server.wait_closed()
+    return {"rtt_ms": args.rtt_ms, "pool_size": settings.SMTP_POOL_SIZE, "batch": args.batch, "modes": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Отправка писем на SMTP-муляж")
+    parser.add_argument("--messages", type=int, default=2000, help="Писем в каждом режиме")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Задержка муляжа перед каждым ответом, мс")
+    parser.add_argument("--pool-size", type=int, default=2, help="SMTP_POOL_SIZE")
+    parser.add_argument("--batch", type=int, default=50, help="Писем в одном вызове send_many")
+    parser.add_argument("--mode", dest="modes", action="append", choices=MODES, help="Режим (по умолчанию — все)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+    args.modes = args.modes or list(MODES)
+
+    # Порт муляжа должен быть известен до импорта настроек
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    os.environ["SMTP_ENABLED"] = "true"
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(sock.getsockname()[1])
+    os.environ["SMTP_USE_TLS"] = "false"
+    os.environ["SMTP_USER"] = "bench@example.com"
+    os.environ["SMTP_PASSWORD"] = "bench"
+    os.environ["SMTP_POOL_SIZE"] = str(args.pool_size)
+
+    results = asyncio.run(run(args, sock))
+
+    print(f"rtt {results['rtt_ms']} ms, pool size {results['pool_size']}, batch {results['batch']}")
+    ok = True
+    for mode, row in results["modes"].items():
+        ok = ok and row["received"] == row["messages"] and not row["failed"]
+        print(
+            f"{mode:<12} {row['messages_per_second']:>9} msg/s  {row['received']}/{row['messages']} received, "
+            f"{row['connections']} connections, {row['elapsed_s']} s"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Задержка расписания во время шквала входов
+
+--readers клиентов запрашивают расписание на день (GET /api/trips/),
+сначала без другой нагрузки, затем одновременно с --logins клиентами,
+которые непрерывно входят (POST /api/auth/login, pbkdf2 на каждый вход).
+Шквал прогоняется дважды: с хешированием в пуле password_hasher, как в
+приложении, и прямо в цикле событий, как до переноса в пул (--no-inline
+пропускает второй прогон). Для каждой фазы — p50/p99 расписания и число
+входов по статусам ответа; лимит частоты отключен, ограничение
+одновременных входов (AUTH_CONCURRENCY) действует.
+
+Запуск из корня репозитория:
+    python -m benchmarks.login_storm --readers 10 --logins 32 --requests 2000 --output storm.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import BENCH_PASSWORD, BENCH_USER, isolated_environment, percentile
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    import httpx
+
+    from backend.api.seed import seed_synthetic_trips, seed_user
+    from backend.core.config import settings
+    from backend.core.database import engine
+    from backend.core.security import password_hasher
+    from backend.main import app
+
+    logging.disable(logging.WARNING)
+    url = f"/api/trips/?departure_date={date.today().isoformat()}"
+    credentials = {"username": BENCH_USER, "password": BENCH_PASSWORD}
+    hasher_run = password_hasher.run
+
+    async def inline(func, *func_args):
+        return func(*func_args)
+
+    async def phase(client, logins: int) -> Dict[str, Any]:
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        numbers = iter(range(args.requests))
+        done = asyncio.Event()
+
+        async def reader() -> None:
+            for _ in numbers:
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        async def login() -> None:
+            while not done.is_set():
+                response = await client.post("/api/auth/login", data=credentials)
+                statuses[response.status_code] += 1
+
+        storm = [asyncio.create_task(login()) for _ in range(logins)]
+        started = time.perf_counter()
+        await asyncio.gather(*(reader() for _ in range(args.readers)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*storm)
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "logins": {str(code): count for code, count in sorted(statuses.items())},
+            "logins_per_second": round(statuses.get(200, 0) / elapsed, 1),
+        }
+
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        await seed_synthetic_trips(args.trips, args.days)
+        await seed_user(BENCH_USER, BENCH_PASSWORD, is_dispatcher=True)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+            # Прогрев: шаблоны, кэши, первый pbkdf2
+            await phase(client, 1)
+            results["idle"] = await phase(client, 0)
+            results["storm_pool"] = await phase(client, args.logins)
+            if args.inline:
+                password_hasher.run = inline
+                try:
+                    results["storm_inline"] = await phase(client, args.logins)
+                finally:
+                    password_hasher.run = hasher_run
+    await engine.dispose()
+    return {
+        "trips": args.trips,
+        "readers": args.readers,
+        "logins": args.logins,
+        "hash_rounds": settings.PASSWORD_HASH_ROUNDS,
+        "hash_workers": settings.PASSWORD_HASH_WORKERS,
+        "auth_concurrency": settings.AUTH_CONCURRENCY,
+        "phases": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Задержка расписания во время шквала входов")
+    parser.add_argument("--trips", type=int, default=10000, help="Синтетических рейсов в базе")
+    parser.add_argument("--days", type=int, default=30, help="На сколько дней распределить рейсы")
+    parser.add_argument("--readers", type=int, default=10, help="Параллельных клиентов расписания")
+    parser.add_argument("--logins", type=int, default=32, help="Параллельных клиентов входа")
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов расписания в каждой фазе")
+    parser.add_argument("--no-inline", dest="inline", action="store_false",
+                        help="Не прогонять шквал с хешированием в цикле событий")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    isolated_environment("storm")
+
+    results = asyncio.run(run(args))
+
+    print(
+        f"{results['trips']} trips, {results['readers']} readers, {results['logins']} login clients, "
+        f"{results['hash_rounds']} rounds, {results['hash_workers']} hash workers"
+    )
+    for name, row in results["phases"].items():
+        print(
+            f"{name:<14} p50 {row['p50_ms']:>9} ms  p99 {row['p99_ms']:>9} ms  max {row['max_ms']:>9} ms  "
+            f"{row['throughput_rps']:>8} rps  logins {row['logins']} ({row['logins_per_second']}/s)"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+План и время запроса списка рейсов на одну дату
+
+Сравниваются прежний фильтр func.date(departure_time) = :day и текущий
+полуинтервал [начало дня, начало следующего дня) из build_trips_query.
+На SQLite выводится EXPLAIN QUERY PLAN, на других СУБД — EXPLAIN.
+Во временной БД SQLite оба запроса затем повторяются без составного
+индекса ix_trips_active_departure — как в схеме до его появления:
+прежний запрос дает SCAN trips, текущий — SEARCH по departure_time.
+С составным индексом прежний запрос ищет только по is_active=? и все
+равно перебирает все активные рейсы.
+
+Запуск из корня репозитория:
+    python -m benchmarks.query_plan --trips 1000000 --output query_plan.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import isolated_environment
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    from sqlalchemy import func, select
+
+    from backend.api.seed import seed_synthetic_trips
+    from backend.api.trips import TripFilters, build_trips_query
+    from backend.core.database import AsyncSessionLocal, engine
+    from backend.core.migrations import migrate
+    from backend.models.trip import Trip
+
+    logging.disable(logging.WARNING)
+    await migrate(engine)
+    started = time.perf_counter()
+    await seed_synthetic_trips(args.trips, args.days)
+    seed_seconds = time.perf_counter() - started
+
+    day = date.today() + timedelta(days=1)
+    async with AsyncSessionLocal() as session:
+        queries = {
+            "func_date": (
+                select(Trip)
+                .where(Trip.is_active == True, func.date(Trip.departure_time) == day)  # noqa: E712
+                .order_by(Trip.departure_time, Trip.id)
+            ),
+            "range": await build_trips_query(session, TripFilters(None, None, day, day)),
+        }
+
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    results: Dict[str, Any] = {}
+
+    async def measure(conn, suffix: str = "") -> None:
+        for name, query in queries.items():
+            sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            plan = [str(row[-1]) for row in await conn.exec_driver_sql(explain + sql)]
+            timings = []
+            rows = 0
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                rows = len((await conn.exec_driver_sql(sql)).all())
+                timings.append(time.perf_counter() - started)
+            results[name + suffix] = {
+                "plan": plan,
+                "rows": rows,
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+            }
+
+    async with engine.connect() as conn:
+        await measure(conn)
+    if not args.database_url:
+        # Схема до составного индекса (is_active, departure_time): только во временной БД
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("DROP INDEX ix_trips_active_departure")
+        # Новые соединения: кэш подготовленных запросов sqlite3 хранит прежние планы
+        await engine.dispose()
+        async with engine.connect() as conn:
+            await measure(conn, "_without_composite_index")
+    await engine.dispose()
+    return {
+        "database": engine.dialect.name,
+        "trips": args.trips,
+        "day": day.isoformat(),
+        "seed_s": round(seed_seconds, 1),
+        "queries": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="План запроса списка рейсов на дату")
+    parser.add_argument("--trips", type=int, default=1000000, help="Синтетических рейсов в базе")
+    parser.add_argument("--days", type=int, default=365, help="На сколько дней распределить рейсы")
+    parser.add_argument("--runs", type=int, default=20, help="Повторов каждого запроса")
+    parser.add_argument("--database-url", help="База для прогона (по умолчанию — новый файл SQLite)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    isolated_environment("plan", args.database_url)
+
+    results = asyncio.run(run(args))
+
+    print(f"{results['database']}, {results['trips']} trips, day {results['day']}")
+    for name, row in results["queries"].items():
+        print(f"\n{name}: {row['rows']} rows, median {row['median_ms']} ms, min {row['min_ms']} ms")
+        for line in row["plan"]:
+            print(f"  {line}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Нагрузочные замеры горячих путей API
+
+Приложение запускается в процессе (httpx.ASGITransport) на отдельной
+базе SQLite с синтетическим расписанием. Для каждого сценария считаются
+пропускная способность, задержки p50/p95/p99, процессорное время и байты
+тела ответа (как переданы, до распаковки) на запрос.
+
+Запуск из корня репозитория:
+    python -m benchmarks.run --trips 10000 --requests 2000 --concurrency 50 --output bench.json
+    python -m benchmarks.run --trips 10000 --compare bench.json --threshold 0.15
+
+С --url нагружается запущенный сервер по HTTP, например для сравнения
+числа воркеров (python run.py --prod --workers N).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (метод, путь, дополнительные аргументы httpx)
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+BENCH_USER = "bench_dispatcher"
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class Scenario:
+    """Сценарий нагрузки: построение i-го запроса"""
+    name: str
+    request: Callable[[int], RequestSpec]
+
+
+@dataclass
+class BenchContext:
+    """Данные, нужные сценариям (заполняются после заполнения базы)"""
+    today: date
+    trip_ids: List[int]
+    token: str
+    rng: random.Random
+
+
+def build_scenarios(ctx: BenchContext) -> Dict[str, Scenario]:
+    today = ctx.today.isoformat()
+    week = (ctx.today + timedelta(days=6)).isoformat()
+    auth = {"Authorization": f"Bearer {ctx.token}"}
+
+    def purchase(i: int) -> RequestSpec:
+        return "POST", "/api/tickets/", {"json": {
+            "trip_id": ctx.rng.choice(ctx.trip_ids),
+            "full_name": f"Пассажир {i}",
+            "email": f"passenger{i}@example.com",
+            "consent_to_processing": True,
+        }}
+
+    scenarios = [
+        Scenario("health", lambda i: ("GET", "/health", {})),
+        Scenario("home_page", lambda i: ("GET", "/", {"headers": {"Accept-Encoding": "br, gzip"}})),
+        Scenario("home_page_identity", lambda i: ("GET", "/", {"headers": {"Accept-Encoding": "identity"}})),
+        Scenario("list_trips_day", lambda i: ("GET", f"/api/trips/?departure_date={today}", {})),
+        Scenario("list_trips_week", lambda i: (
+            "GET", f"/api/trips/?origin=Моск&date_from={today}&date_to={week}", {},
+        )),
+        Scenario("trips_page", lambda i: ("GET", f"/api/trips/page?limit=50&date_from={today}", {})),
+        Scenario("current_user", lambda i: ("GET", "/api/auth/me", {"headers": auth})),
+        Scenario("login", lambda i: ("POST", "/api/auth/login", {
+            "data": {"username": BENCH_USER, "password": BENCH_PASSWORD},
+        })),
+        Scenario("purchase_ticket", purchase),
+        # Чтение расписания вперемешку с покупками: каждый пятый запрос пишет
+        Scenario("mixed_read_write", lambda i: (
+            purchase(i) if i % 5 == 0 else ("GET", f"/api/trips/?departure_date={today}", {})
+        )),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+def isolated_environment(name: str, database_url: Optional[str] = None, **overrides: str) -> str:
+    """
+    Окружение прогона в процессе; вызывать до импорта backend (настройки читаются при импорте).
+
+    База — database_url или новый файл SQLite `<name>.db` во временном каталоге.
+    Письма, демонстрационные данные и лимит частоты (все запросы идут с одного
+    адреса) выключаются; overrides — дополнительные переменные окружения.
+    Возвращает временный каталог.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"balbus-{name}-")
+    os.environ["DATABASE_URL"] = database_url or f"sqlite+aiosqlite:///{workdir}/{name}.db"
+    os.environ["SMTP_ENABLED"] = "false"
+    os.environ["SEED_DEMO_DATA"] = "false"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.update(overrides)
+    return workdir
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(q / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Выполнить `requests` запросов сценария с `concurrency` параллельными клиентами"""
+    latencies: List[float] = []
+    errors = 0
+    downloaded = 0
+    numbers = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors, downloaded
+        for i in numbers:
+            method, url, kwargs = scenario.request(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            downloaded += response.num_bytes_downloaded
+            if response.status_code >= 400:
+                errors += 1
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    latencies.sort()
+    ms = 1000.0
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * ms, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * ms, 3),
+        "p95_ms": round(percentile(latencies, 95) * ms, 3),
+        "p99_ms": round(percentile(latencies, 99) * ms, 3),
+        "max_ms": round(latencies[-1] * ms, 3) if latencies else 0.0,
+        "cpu_ms_per_request": round(cpu / len(latencies) * ms, 3) if latencies else 0.0,
+        "bytes_per_request": round(downloaded / len(latencies)) if latencies else 0,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Регрессии относительно сохраненного прогона"""
+    regressions = []
+    for name, current in results["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request"):
+            if base.get(metric) and current[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {base[metric]} -> {current[metric]} (+{current[metric] / base[metric] - 1:.0%})"
+                )
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput_rps {base['throughput_rps']} -> {current['throughput_rps']} "
+                f"(-{1 - current['throughput_rps'] / base['throughput_rps']:.0%})"
+            )
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    header = (
+        f"{'scenario':<18} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'cpu ms':>8} {'bytes':>9} {'errors':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, row in results["results"].items():
+        print(
+            f"{name:<18} {row['throughput_rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+            f"{row['p99_ms']:>9} {row['cpu_ms_per_request']:>8} {row.get('bytes_per_request', 0):>9} {row['errors']:>7}"
+        )
+
+
+async def run_all(client, ctx: BenchContext, args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = build_scenarios(ctx)
+    selected = args.scenario or list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}; available: {', '.join(scenarios)}")
+
+    results: Dict[str, Any] = {}
+    for name in selected:
+        if args.warmup:
+            await run_scenario(client, scenarios[name], args.warmup, args.concurrency)
+        results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency)
+    return results
+
+
+async def login(client) -> str:
+    response = await client.post("/api/auth/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_in_process(args: argparse.Namespace) -> Tuple[Dict[str, Any], int]:
+    """Приложение в этом процессе через ASGITransport, база заполняется здесь же"""
+    # Импорт после настройки окружения: настройки читаются при импорте
+    import httpx
+    from sqlalchemy import select
+
+    from backend.api.seed import seed_synthetic_trips, seed_user
+    from backend.core.database import AsyncSessionLocal
+    from backend.main import app
+    from backend.models.trip import Trip
+
+    logging.disable(logging.WARNING)
+
+    async with app.router.lifespan_context(app):
+        if args.trips:
+            await seed_synthetic_trips(args.trips, args.days)
+        await seed_user(BENCH_USER, BENCH_PASSWORD, is_dispatcher=True)
+        async with AsyncSessionLocal() as session:
+            trip_ids = list((await session.execute(select(Trip.id).where(Trip.is_active == True))).scalars())  # noqa: E712
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            ctx = BenchContext(today=date.today(), trip_ids=trip_ids, token=await login(client), rng=random.Random(0))
+            return await run_all(client, ctx, args), len(trip_ids)
+
+
+async def run_remote(args: argparse.Namespace) -> Tuple[Dict[str, Any], int]:
+    """
+    Запущенный сервер по HTTP (например, python run.py --prod --workers N).
+
+    Расписание заполняется заранее: python -m backend.api.seed --trips N.
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=60.0, limits=limits) as client:
+        # Пользователь для входа; если уже есть, сервер ответит 400
+        await client.post("/api/auth/register", json={
+            "email": f"{BENCH_USER}@example.com",
+            "username": BENCH_USER,
+            "full_name": BENCH_USER,
+            "password": BENCH_PASSWORD,
+            "consent_to_processing": True,
+        })
+        response = await client.get("/api/trips/page", params={"limit": 500, "date_from": date.today().isoformat()})
+        response.raise_for_status()
+        trip_ids = [trip["id"] for trip in response.json()["items"]]
+        if not trip_ids:
+            raise SystemExit("No trips on the server: seed it first (python -m backend.api.seed --trips N)")
+        ctx = BenchContext(today=date.today(), trip_ids=trip_ids, token=await login(client), rng=random.Random(0))
+        return await run_all(client, ctx, args), len(trip_ids)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results, trips = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "target": args.url or "in-process",
+            "trips": trips,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочные замеры API")
+    parser.add_argument("--trips", type=int, default=10000, help="Синтетических рейсов в базе")
+    parser.add_argument("--days", type=int, default=30, help="На сколько дней распределить рейсы")
+    parser.add_argument("--requests", type=int, default=1000, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=20, help="Параллельных клиентов")
+    parser.add_argument("--warmup", type=int, default=50, help="Прогревочных запросов на сценарий")
+    parser.add_argument("--scenario", action="append", help="Запустить только указанные сценарии (можно несколько раз)")
+    parser.add_argument("--url", help="Нагружать запущенный сервер по HTTP вместо приложения в процессе")
+    parser.add_argument("--database-url", help="База для прогона (по умолчанию — новый файл SQLite во временном каталоге)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--compare", help="Сравнить с сохраненным JSON и завершиться с кодом 1 при регрессии")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Допустимое ухудшение для --compare (доля)")
+    args = parser.parse_args(argv)
+
+    # С --trips 0 покупки идут на демонстрационные рейсы
+    isolated_environment("bench", args.database_url, SEED_DEMO_DATA="true")
+
+    results = run(args)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions vs {args.compare} (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions vs {args.compare} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
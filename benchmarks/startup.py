@@ -0,0 +1,125 @@
+"""
+Время запуска приложения до первого ответа
+
+Каждый замер — отдельный процесс Python (холодный импорт модулей) на одной
+и той же заранее заполненной базе SQLite. Фазы: импорт backend.main, старт
+(lifespan: миграции, тестовые данные, справочник городов, фоновые задачи),
+первый запрос GET /api/trips/?departure_date=<сегодня>.
+
+Запуск из корня репозитория:
+    python -m benchmarks.startup --trips 100000 --runs 5 --output startup.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+# Модули, которые не должны загружаться до первого обращения к ним
+DEFERRED_MODULES = ("aiosmtplib", "passlib", "jose")
+
+
+def _seed(trips: int) -> None:
+    from backend.api.seed import seed_synthetic_trips
+    from backend.core.database import engine
+    from backend.core.migrations import migrate
+    import backend.main  # noqa: F401  (регистрация всех моделей)
+
+    async def seed() -> None:
+        await migrate(engine)
+        await seed_synthetic_trips(trips)
+        await engine.dispose()
+
+    asyncio.run(seed())
+
+
+def _measure() -> Dict[str, Any]:
+    import logging
+
+    import httpx
+
+    logging.disable(logging.WARNING)
+    started = time.perf_counter()
+    import backend.main as main
+    imported = time.perf_counter()
+
+    async def boot():
+        async with main.app.router.lifespan_context(main.app):
+            ready = time.perf_counter()
+            loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.get(f"/api/trips/?departure_date={date.today().isoformat()}")
+            first = time.perf_counter()
+        return ready, first, response.status_code, loaded
+
+    ready, first, status, loaded = asyncio.run(boot())
+    ms = 1000.0
+    return {
+        "import_ms": round((imported - started) * ms, 1),
+        "startup_ms": round((ready - imported) * ms, 1),
+        "first_request_ms": round((first - ready) * ms, 1),
+        "time_to_first_response_ms": round((first - started) * ms, 1),
+        "status": status,
+        "deferred_modules_loaded_at_startup": loaded,
+    }
+
+
+def _child(mode: str, env: Dict[str, str], trips: int = 0) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", f"--{mode}", str(trips)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Время запуска до первого ответа")
+    parser.add_argument("--trips", type=int, default=100000, help="Рейсов в базе")
+    parser.add_argument("--runs", type=int, default=5, help="Число запусков")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--seed", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        _seed(args.seed)
+        return 0
+    if args.measure is not None:
+        print(json.dumps(_measure()))
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="balbus-startup-")
+    env = {**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/startup.db", "SMTP_ENABLED": "false"}
+    _child("seed", env, args.trips)
+
+    runs = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        result = _child("measure", env)
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        # Включая запуск интерпретатора
+        run["process_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        runs.append(run)
+
+    keys = ("import_ms", "startup_ms", "first_request_ms", "time_to_first_response_ms", "process_ms")
+    summary = {key: round(statistics.median(run[key] for run in runs), 1) for key in keys}
+    results = {"trips": args.trips, "runs": runs, "median": summary}
+
+    for key in keys:
+        print(f"{key:<28} {summary[key]:>10}")
+    print(f"{'deferred modules loaded':<28} {runs[-1]['deferred_modules_loaded_at_startup'] or '-'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Генератор номеров билетов: скорость и проверка на совпадения
+
+Каждый процесс занимает слот так же, как воркер приложения (файлы-блокировки
+во временном каталоге), и выдает свою часть номеров. Внутри процесса каждый
+номер должен быть строго больше предыдущего, между процессами номера
+различаются битами процесса — поэтому совпадений нет без хранения всех
+номеров в памяти. Для выборки номеров дополнительно проверяются запись
+строкой (разбор, контрольный символ, порядок строк).
+
+Запуск из корня репозитория:
+    python -m benchmarks.ticket_numbers --count 100000000 --processes 8
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+SAMPLE_EVERY = 1000
+
+
+def _generate(args) -> Dict[str, Any]:
+    from backend.core.ticket_numbers import (
+        TicketNumberGenerator,
+        format_ticket_number,
+        parse_ticket_number,
+        split_ticket_id,
+    )
+
+    count, lock_dir, node_id = args
+    generator = TicketNumberGenerator(node_id, lock_dir)
+    next_id = generator.next_id
+    errors: List[str] = []
+
+    started = time.perf_counter()
+    first = previous = next_id()
+    previous_number = format_ticket_number(previous)
+    for i in range(1, count):
+        ticket_id = next_id()
+        if ticket_id <= previous:
+            errors.append(f"not increasing: {previous} -> {ticket_id}")
+            break
+        if i % SAMPLE_EVERY == 0:
+            number = format_ticket_number(ticket_id)
+            if parse_ticket_number(number) != ticket_id:
+                errors.append(f"round trip failed: {ticket_id} -> {number}")
+            if number <= previous_number:
+                errors.append(f"string order broken: {previous_number} -> {number}")
+            if split_ticket_id(ticket_id)[1] != generator.worker_id:
+                errors.append(f"worker bits mismatch: {ticket_id}")
+            previous_number = number
+        previous = ticket_id
+    elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(min(count, 100000)):
+        generator.next_number()
+    format_elapsed = time.perf_counter() - started
+
+    return {
+        "worker_id": generator.worker_id,
+        "count": count,
+        "first": first,
+        "last": previous,
+        "ids_per_second": round(count / elapsed) if elapsed else 0,
+        "numbers_per_second": round(min(count, 100000) / format_elapsed) if format_elapsed else 0,
+        "clock_waits": generator.clock_waits,
+        "errors": errors[:10],
+    }
+
+
+def birthday_probability(per_day: int, bits: int = 32) -> float:
+    """Вероятность хотя бы одного совпадения среди per_day случайных bits-битных ключей"""
+    return -math.expm1(-per_day * (per_day - 1) / (2.0 * 2 ** bits))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Скорость и уникальность номеров билетов")
+    parser.add_argument("--count", type=int, default=100_000_000, help="Всего номеров")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="Параллельных процессов")
+    parser.add_argument("--node-id", type=int, default=0, help="TICKET_NODE_ID")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    processes = max(1, min(args.processes, 64))
+    lock_dir = tempfile.mkdtemp(prefix="balbus-ticket-")
+    shares = [args.count // processes + (1 if i < args.count % processes else 0) for i in range(processes)]
+
+    started = time.perf_counter()
+    # Процессы живут до конца замера: слоты не освобождаются и не переиспользуются
+    with multiprocessing.Pool(processes) as pool:
+        runs = pool.map(_generate, [(share, lock_dir, args.node_id) for share in shares], chunksize=1)
+    elapsed = time.perf_counter() - started
+
+    workers = [run["worker_id"] for run in runs]
+    errors = [error for run in runs for error in run["errors"]]
+    if len(set(workers)) != len(workers):
+        errors.append(f"duplicate worker ids: {workers}")
+
+    total = sum(run["count"] for run in runs)
+    results = {
+        "count": total,
+        "processes": processes,
+        "elapsed_s": round(elapsed, 1),
+        "ids_per_second_per_process": round(sum(run["ids_per_second"] for run in runs) / processes),
+        "numbers_per_second_per_process": round(sum(run["numbers_per_second"] for run in runs) / processes),
+        "clock_waits": sum(run["clock_waits"] for run in runs),
+        "collisions": 0 if not errors else None,
+        "errors": errors,
+        # Прежняя схема: 8 шестнадцатеричных символов uuid4 на дату
+        "old_scheme_collision_probability": {
+            str(per_day): round(birthday_probability(per_day), 6) for per_day in (10_000, 100_000, 1_000_000)
+        },
+    }
+
+    print(f"{'ids':<34} {total}")
+    print(f"{'processes':<34} {processes}")
+    print(f"{'ids/s per process':<34} {results['ids_per_second_per_process']}")
+    print(f"{'formatted numbers/s per process':<34} {results['numbers_per_second_per_process']}")
+    print(f"{'sequence exhausted (waits)':<34} {results['clock_waits']}")
+    print(f"{'errors':<34} {len(errors)}")
+    for error in errors:
+        print(f"  {error}")
+    for per_day, probability in results["old_scheme_collision_probability"].items():
+        print(f"{'old scheme P(collision), ' + per_day + '/day':<34} {probability}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Сериализация списков рейсов: TripResponse против быстрого пути TRIPS_FAST_JSON
+
+--trips рейсов распределяются по --trips / 10 дням (по 10 рейсов в день),
+так что диапазон дат дает списки из 10, 1000 и 100000 рейсов. Для каждого
+размера список строится _load_trips (запрос и JSON, как при промахе кэша
+в list_trips) с TRIPS_FAST_JSON выключенным и включенным; считаются
+строк в секунду и процессорное время на список. Ответы обоих путей
+сравниваются после разбора JSON.
+
+Запуск из корня репозитория:
+    python -m benchmarks.trip_json --trips 100000 --output trip_json.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import isolated_environment
+
+TRIPS_PER_DAY = 10
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Импорт после настройки окружения: настройки читаются при импорте
+    from backend.api.seed import seed_synthetic_trips
+    from backend.api.trips import TripFilters, _load_trips
+    from backend.core.config import settings
+    from backend.core.database import AsyncSessionLocal, engine
+    from backend.core.migrations import migrate
+
+    logging.disable(logging.WARNING)
+    await migrate(engine)
+    await seed_synthetic_trips(args.trips, args.trips // TRIPS_PER_DAY)
+
+    today = date.today()
+    results: Dict[str, Any] = {}
+    fast_json = settings.TRIPS_FAST_JSON
+    try:
+        for size in args.sizes:
+            filters = TripFilters(None, None, today, today + timedelta(days=size // TRIPS_PER_DAY - 1))
+            bodies = {}
+            for mode, fast in (("orm", False), ("fast", True)):
+                settings.TRIPS_FAST_JSON = fast
+                timings = []
+                cpu = []
+                async with AsyncSessionLocal() as session:
+                    # Прогрев: компиляция запроса, кэши адаптеров
+                    bodies[mode], _ = await _load_trips(session, filters)
+                    for _ in range(args.runs):
+                        cpu_started = time.process_time()
+                        started = time.perf_counter()
+                        await _load_trips(session, filters)
+                        timings.append(time.perf_counter() - started)
+                        cpu.append(time.process_time() - cpu_started)
+                median = statistics.median(timings)
+                rows = len(json.loads(bodies[mode]))
+                results[f"{mode}_{size}"] = {
+                    "mode": mode,
+                    "rows": rows,
+                    "median_ms": round(median * 1000, 3),
+                    "cpu_ms": round(statistics.median(cpu) * 1000, 3),
+                    "rows_per_second": round(rows / median, 1) if median else 0.0,
+                    "body_bytes": len(bodies[mode]),
+                }
+            results[f"fast_{size}"]["same_json"] = json.loads(bodies["orm"]) == json.loads(bodies["fast"])
+    finally:
+        settings.TRIPS_FAST_JSON = fast_json
+    await engine.dispose()
+    return {"trips": args.trips, "runs": args.runs, "lists": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сериализация списков рейсов")
+    parser.add_argument("--trips", type=int, default=100000, help="Синтетических рейсов в базе")
+    parser.add_argument("--size", dest="sizes", type=int, action="append",
+                        help="Рейсов в списке, кратно 10 (можно несколько раз; по умолчанию 10, 1000, 100000)")
+    parser.add_argument("--runs", type=int, default=10, help="Повторов каждого списка")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+    args.sizes = [size for size in args.sizes or [10, 1000, 100000] if size <= args.trips]
+
+    isolated_environment("json")
+
+    results = asyncio.run(run(args))
+
+    ok = True
+    for name, row in results["lists"].items():
+        ok = ok and row.get("same_json", True)
+        same = {True: "  same JSON", False: "  JSON DIFFERS"}.get(row.get("same_json"), "")
+        print(
+            f"{name:<12} {row['rows']:>7} rows  {row['median_ms']:>10} ms  cpu {row['cpu_ms']:>10} ms  "
+            f"{row['rows_per_second']:>10} rows/s{same}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
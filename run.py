@@ -1,9 +1,19 @@
 """
 Скрипт для запуска FastAPI приложения
+
+    python run.py          # разработка: один процесс с автоперезагрузкой
+    python run.py --prod   # продакшен: несколько воркеров, uvloop и httptools
 """
+import argparse
+import asyncio
+import importlib.util
+import os
+
 import uvicorn
 
-if __name__ == "__main__":
+
+def run_dev():
+    """Один процесс с автоперезагрузкой при изменении кода"""
     uvicorn.run(
         "backend.main:app",
         host="0.0.0.0",
@@ -11,3 +21,55 @@ if __name__ == "__main__":
         reload=True,
     )
 
+
+async def _prepare():
+    from backend.core.database import engine, read_engine
+    from backend.main import prepare_database
+
+    await prepare_database()
+    # Соединения привязаны к циклу событий главного процесса: воркеры откроют свои
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
+
+
+def run_prod(workers: int):
+    """
+    Несколько воркеров uvicorn без автоперезагрузки.
+
+    Таблицы и тестовые данные готовятся один раз здесь, до запуска воркеров;
+    воркеры получают DB_PREPARED=true и пропускают эту работу. Супервизор
+    uvicorn перезапускает завершившиеся воркеры (в том числе после
+    SERVER_LIMIT_MAX_REQUESTS запросов), по SIGTERM воркеры дожидаются
+    текущих запросов до SERVER_GRACEFUL_TIMEOUT.
+    """
+    from backend.core.config import settings
+
+    asyncio.run(_prepare())
+    os.environ["DB_PREPARED"] = "true"
+
+    uvicorn.run(
+        "backend.main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers or settings.SERVER_WORKERS or os.cpu_count() or 1,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        limit_max_requests=settings.SERVER_LIMIT_MAX_REQUESTS or None,
+        timeout_graceful_shutdown=int(settings.SERVER_GRACEFUL_TIMEOUT),
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        proxy_headers=True,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запуск BAL_BUS")
+    parser.add_argument("--prod", action="store_true", help="Продакшен-режим: несколько воркеров без автоперезагрузки")
+    parser.add_argument("--workers", type=int, default=0, help="Число воркеров (по умолчанию SERVER_WORKERS или число CPU)")
+    args = parser.parse_args()
+
+    if args.prod:
+        run_prod(args.workers)
+    else:
+        run_dev()